@@ -0,0 +1,233 @@
+# app/auth.py
+"""
+API Key 认证
+
+Key 保存在 api_keys 表中。验证结果按 Key 的 SHA-256 摘要缓存在进程内（TTL），
+缓存命中时不访问数据库；未命中时在线程中查询一次并写入缓存。
+失效方式：
+  - 本进程通过管理接口新增或停用 Key 时立即失效
+  - 其他进程（其他 worker、create_api_key.py）修改时递增 api_key_revision 表中的修订号，
+    各进程的后台任务定期读取修订号，发现变化即清空缓存
+环境变量 API_KEY 若已设置，也作为一个有效的 Key（兼容原先的单 Key 配置）。
+缓存未命中时先查布隆过滤器（全部有效 Key 的摘要，修订号变化时重建）：判定不存在的 Key
+直接拒绝，不访问数据库，大量伪造 Key 的请求因此只花一次哈希计算；误判（默认约 0.1%）
+以及已停用但尚未重建的 Key 仍由数据库查询兜底。其他进程新增的 Key 要等本进程下次读取
+修订号并重建过滤器后才能通过（最长 LIUYAO_AUTH_REVISION_POLL 秒）。
+过滤器尚未建立（启动后首次读取前、数据库不可用）时退回直接查库。
+查库默认在线程中执行；启用 LIUYAO_DB_ASYNC 时改用 aiosqlite 异步会话，直接在事件循环中等待。
+  LIUYAO_AUTH_CACHE_TTL       缓存秒数（默认 300）
+  LIUYAO_AUTH_CACHE_SIZE      最多缓存的 Key 数（默认 10000）
+  LIUYAO_AUTH_REVISION_POLL   修订号轮询间隔秒数（默认 2）
+  LIUYAO_AUTH_BLOOM_FP_RATE   布隆过滤器的目标误判率（默认 0.001）
+"""
+import asyncio
+import hashlib
+import hmac
+import logging
+import math
+import os
+import threading
+import time
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+import crud
+import database
+from database import SessionLocal
+from services.metrics import AUTH_REJECTED_BLOOM, AUTH_REJECTED_DB
+
+logger = logging.getLogger(__name__)
+
+AUTH_CACHE_TTL = float(os.getenv("LIUYAO_AUTH_CACHE_TTL", "300"))
+AUTH_CACHE_SIZE = int(os.getenv("LIUYAO_AUTH_CACHE_SIZE", "10000"))
+AUTH_REVISION_POLL = float(os.getenv("LIUYAO_AUTH_REVISION_POLL", "2"))
+AUTH_BLOOM_FP_RATE = float(os.getenv("LIUYAO_AUTH_BLOOM_FP_RATE", "0.001"))
+
+
+class ApiKeyPrincipal(NamedTuple):
+    """通过认证的调用方；来自环境变量 API_KEY 时 id 为 0"""
+    id: int
+    owner: str
+    rate_limit: Optional[float] = None  # 为空时使用默认限流设置
+    rate_burst: Optional[float] = None
+
+
+ENV_PRINCIPAL = ApiKeyPrincipal(0, "env")
+
+
+def hash_key(key: str) -> bytes:
+    return hashlib.sha256(key.encode("utf-8")).digest()
+
+
+class BloomFilter:
+    """
+    Key 摘要的布隆过滤器
+    摘要本身即均匀分布的哈希值，取前 16 字节作两个 64 位哈希，按双重哈希得到 k 个位置
+    """
+
+    def __init__(self, capacity: int, fp_rate: float = AUTH_BLOOM_FP_RATE):
+        capacity = max(capacity, 1)
+        self.num_bits = max(64, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    @classmethod
+    def from_digests(cls, digests: Iterable[bytes], fp_rate: float = AUTH_BLOOM_FP_RATE) -> "BloomFilter":
+        digests = list(digests)
+        # 预留容量给本进程随后新增的 Key，避免重建前误判率上升
+        bloom = cls(max(2 * len(digests), 1024), fp_rate)
+        for digest in digests:
+            bloom.add(digest)
+        return bloom
+
+    def _positions(self, digest: bytes):
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:16], 'little') | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, digest: bytes) -> None:
+        for pos in self._positions(digest):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, digest: bytes) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(digest))
+
+
+class ApiKeyCache:
+    """摘要 -> 调用方，带 TTL；满时淘汰最早写入的条目"""
+
+    def __init__(self, ttl: float = AUTH_CACHE_TTL, maxsize: int = AUTH_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: Dict[bytes, Tuple[float, ApiKeyPrincipal]] = {}
+        self._lock = threading.Lock()
+        self.revision: Optional[int] = None
+        # 全部有效 Key 的布隆过滤器，随修订号重建；None 表示尚未建立
+        self.key_filter: Optional[BloomFilter] = None
+
+    def get(self, digest: bytes) -> Optional[ApiKeyPrincipal]:
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            with self._lock:
+                self._entries.pop(digest, None)
+            return None
+        return entry[1]
+
+    def put(self, digest: bytes, principal: ApiKeyPrincipal) -> None:
+        with self._lock:
+            if len(self._entries) >= self.maxsize and digest not in self._entries:
+                # dict 保持插入顺序，第一个即最早写入的
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[digest] = (time.monotonic() + self.ttl, principal)
+
+    def invalidate_id(self, key_id: int) -> None:
+        with self._lock:
+            for digest in [d for d, (_, p) in self._entries.items() if p.id == key_id]:
+                del self._entries[digest]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+API_KEY_CACHE = ApiKeyCache()
+
+
+def _env_key_digest() -> Optional[bytes]:
+    env_key = os.getenv("API_KEY")
+    return hash_key(env_key) if env_key else None
+
+
+def cached_principal(key: str) -> Tuple[bytes, Optional[ApiKeyPrincipal]]:
+    """只查缓存与环境变量 Key，不访问数据库；返回 (摘要, 调用方或 None)"""
+    digest = hash_key(key)
+    principal = API_KEY_CACHE.get(digest)
+    if principal is not None:
+        return digest, principal
+    env_digest = _env_key_digest()
+    if env_digest is not None and hmac.compare_digest(digest, env_digest):
+        return digest, ENV_PRINCIPAL
+    return digest, None
+
+
+def _principal(db_key) -> ApiKeyPrincipal:
+    return ApiKeyPrincipal(db_key.id, db_key.owner, db_key.rate_limit, db_key.rate_burst)
+
+
+def lookup_principal(key: str, digest: bytes) -> Optional[ApiKeyPrincipal]:
+    """查询数据库（同步，应在线程中调用），有效时写入缓存"""
+    with SessionLocal() as db:
+        db_key = crud.get_api_key(db, key=key)
+        if db_key is None:
+            return None
+        principal = _principal(db_key)
+    API_KEY_CACHE.put(digest, principal)
+    return principal
+
+
+async def lookup_principal_async(key: str, digest: bytes) -> Optional[ApiKeyPrincipal]:
+    """lookup_principal 的异步版本，使用 aiosqlite 会话"""
+    async with database.AsyncSessionLocal() as db:
+        db_key = await crud.get_api_key_async(db, key=key)
+        if db_key is None:
+            return None
+        principal = _principal(db_key)
+    API_KEY_CACHE.put(digest, principal)
+    return principal
+
+
+async def authenticate(key: str) -> Optional[ApiKeyPrincipal]:
+    """验证 Key，缓存命中或布隆过滤器判定不存在时不访问数据库"""
+    digest, principal = cached_principal(key)
+    if principal is not None:
+        return principal
+    key_filter = API_KEY_CACHE.key_filter
+    if key_filter is not None and digest not in key_filter:
+        AUTH_REJECTED_BLOOM.inc()
+        return None
+    if database.AsyncSessionLocal is not None:
+        principal = await lookup_principal_async(key, digest)
+    else:
+        principal = await asyncio.to_thread(lookup_principal, key, digest)
+    if principal is None:
+        AUTH_REJECTED_DB.inc()
+    return principal
+
+
+def remember_key(key: str) -> None:
+    """本进程新增 Key 后立即加入过滤器，不必等下次重建"""
+    key_filter = API_KEY_CACHE.key_filter
+    if key_filter is not None:
+        key_filter.add(hash_key(key))
+
+
+def check_key_revision() -> bool:
+    """读取修订号，与上次不同（或过滤器尚未建立）时重建过滤器，修订号变化时清空缓存；返回是否清空"""
+    with SessionLocal() as db:
+        revision = crud.get_key_revision(db)
+        if revision == API_KEY_CACHE.revision and API_KEY_CACHE.key_filter is not None:
+            return False
+        keys = crud.get_active_keys(db)
+    # 先读修订号再读 Key，期间的修改会使下次读取的修订号不同而再次重建
+    API_KEY_CACHE.key_filter = BloomFilter.from_digests(hash_key(key) for key in keys)
+    previous, API_KEY_CACHE.revision = API_KEY_CACHE.revision, revision
+    if previous is not None and previous != revision:
+        API_KEY_CACHE.clear()
+        return True
+    return False
+
+
+async def revision_poll_loop(interval: float = AUTH_REVISION_POLL) -> None:
+    """持续运行，直到被取消"""
+    while True:
+        try:
+            if await asyncio.to_thread(check_key_revision):
+                logger.info("api_keys 已变更，认证缓存已清空")
+        except Exception:
+            logger.exception("读取 api_keys 修订号失败")
+        await asyncio.sleep(interval)
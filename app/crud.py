@@ -1,12 +1,141 @@
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from datetime import datetime
+
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from . import models
+import models
 
 def get_api_key(db: Session, key: str):
     return db.query(models.ApiKey).filter(models.ApiKey.key == key, models.ApiKey.is_active == True).first()
 
-def create_api_key(db: Session, key: str, owner: str):
-    db_key = models.ApiKey(key=key, owner=owner)
+async def get_api_key_async(db: AsyncSession, key: str):
+    """get_api_key 的异步版本（LIUYAO_DB_ASYNC=1 时使用）"""
+    result = await db.execute(
+        select(models.ApiKey).where(models.ApiKey.key == key, models.ApiKey.is_active == True).limit(1))
+    return result.scalars().first()
+
+def _bump_key_revision(db: Session):
+    """在当前事务中递增 api_keys 的修订号（随调用方一起提交）"""
+    row = db.get(models.ApiKeyRevision, 1)
+    if row is None:
+        db.add(models.ApiKeyRevision(id=1, revision=1))
+    else:
+        row.revision += 1
+
+def get_key_revision(db: Session) -> int:
+    row = db.get(models.ApiKeyRevision, 1)
+    return row.revision if row is not None else 0
+
+def create_api_key(db: Session, key: str, owner: str,
+                   rate_limit: Optional[float] = None, rate_burst: Optional[float] = None):
+    db_key = models.ApiKey(key=key, owner=owner, rate_limit=rate_limit, rate_burst=rate_burst)
     db.add(db_key)
+    _bump_key_revision(db)
     db.commit()
     db.refresh(db_key)
-    return db_key
\ No newline at end of file
+    return db_key
+
+def get_active_keys(db: Session) -> List[str]:
+    return [key for (key,) in db.query(models.ApiKey.key).filter(models.ApiKey.is_active == True)]
+
+def list_api_keys(db: Session) -> List[models.ApiKey]:
+    return db.query(models.ApiKey).order_by(models.ApiKey.id).all()
+
+def deactivate_api_key(db: Session, key_id: int) -> Optional[models.ApiKey]:
+    """停用 Key，不存在时返回 None"""
+    db_key = db.get(models.ApiKey, key_id)
+    if db_key is None:
+        return None
+    if db_key.is_active:
+        db_key.is_active = False
+        _bump_key_revision(db)
+        db.commit()
+        db.refresh(db_key)
+    return db_key
+
+def set_rate_limit(db: Session, key_id: int, rate_limit: Optional[float],
+                   rate_burst: Optional[float]) -> Optional[models.ApiKey]:
+    """修改 Key 的限流设置（None 恢复默认），不存在时返回 None"""
+    db_key = db.get(models.ApiKey, key_id)
+    if db_key is None:
+        return None
+    db_key.rate_limit = rate_limit
+    db_key.rate_burst = rate_burst
+    # 各进程缓存的调用方信息中含限流设置，借修订号让其重新读取
+    _bump_key_revision(db)
+    db.commit()
+    db.refresh(db_key)
+    return db_key
+
+# 每条 INSERT 的行数，4 列 × 500 行远低于 SQLite 的参数个数上限
+USAGE_INSERT_CHUNK = 500
+
+def add_usage(db: Session, rows: List[Dict]):
+    """
+    把一批用量累加到 api_key_usage（同一 key_id、period 已有行时相加），在一个事务中提交
+    :param rows: [{'key_id', 'period', 'requests', 'rejected'}, ...]
+    """
+    table = models.ApiKeyUsage.__table__
+    for i in range(0, len(rows), USAGE_INSERT_CHUNK):
+        stmt = sqlite_insert(table).values(rows[i:i + USAGE_INSERT_CHUNK])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.key_id, table.c.period],
+            set_={'requests': table.c.requests + stmt.excluded.requests,
+                  'rejected': table.c.rejected + stmt.excluded.rejected},
+        )
+        db.execute(stmt)
+    db.commit()
+
+# divinations 的写入列（id 自增），add_divination_records 的每行元组按此顺序排列
+DIVINATION_RECORD_COLUMNS = ('key_id', 'divination_type', 'params', 'ben_code', 'bian_code',
+                             'moving_mask', 'target_time', 'created_at')
+# 每条 INSERT 的行数，8 列 × 500 行远低于 SQLite 的参数个数上限
+HISTORY_INSERT_CHUNK = 500
+
+@lru_cache(maxsize=None)
+def _multi_row_insert(rows: int) -> str:
+    placeholders = "(" + ", ".join("?" * len(DIVINATION_RECORD_COLUMNS)) + ")"
+    return (f"INSERT INTO {models.DivinationRecord.__tablename__} ({', '.join(DIVINATION_RECORD_COLUMNS)}) "
+            f"VALUES {', '.join([placeholders] * rows)}")
+
+def add_divination_records(db: Session, rows: List[Tuple]):
+    """
+    以多行 INSERT 写入一批排盘记录，在一个事务中提交
+    :param rows: 按 DIVINATION_RECORD_COLUMNS 排列的元组，时间已按 SQLite 的存储格式转成字符串
+    语句按行数缓存后直接交给驱动执行：由 SQLAlchemy 逐批编译多行 VALUES 的耗时约为写入本身的数十倍
+    """
+    conn = db.connection()
+    for i in range(0, len(rows), HISTORY_INSERT_CHUNK):
+        chunk = rows[i:i + HISTORY_INSERT_CHUNK]
+        conn.exec_driver_sql(_multi_row_insert(len(chunk)), tuple(value for row in chunk for value in row))
+    db.commit()
+
+def divination_records_query(key_id: Optional[int] = None, ben_code: Optional[int] = None,
+                             divination_type: Optional[str] = None,
+                             start: Optional[datetime] = None, end: Optional[datetime] = None,
+                             before: Optional[Tuple[datetime, int]] = None, limit: int = 100) -> Select:
+    """
+    按条件查询排盘记录，按 (created_at, id) 倒序（新的在前）
+    :param start: created_at 下限（含）；end 为上限（不含）
+    :param before: 游标 (created_at, id)，只取排在它之后的记录，代替 OFFSET：
+                   翻到第几页都只从索引中的游标位置往后读 limit 行
+    """
+    table = models.DivinationRecord.__table__
+    stmt = select(table)
+    if key_id is not None:
+        stmt = stmt.where(table.c.key_id == key_id)
+    if ben_code is not None:
+        stmt = stmt.where(table.c.ben_code == ben_code)
+    if divination_type is not None:
+        stmt = stmt.where(table.c.divination_type == divination_type)
+    if start is not None:
+        stmt = stmt.where(table.c.created_at >= start)
+    if end is not None:
+        stmt = stmt.where(table.c.created_at < end)
+    if before is not None:
+        stmt = stmt.where(tuple_(table.c.created_at, table.c.id) < tuple_(*before))
+    return stmt.order_by(table.c.created_at.desc(), table.c.id.desc()).limit(limit)
@@ -1,12 +1,136 @@
-from sqlalchemy import create_engine
+"""
+数据库连接
+
+默认使用仓库根目录下的 SQLite 文件。每个 SQLite 连接建立时统一设置：
+  - journal_mode=WAL：读不阻塞写、写不阻塞读，多个 worker 同时验证 Key 时互不等待
+  - synchronous=NORMAL：WAL 下只在检查点时 fsync；掉电最多丢失最近提交的事务，不会损坏数据库
+  - busy_timeout：遇到其他进程持有写锁时等待，而不是立即报 database is locked
+  - cache_size、temp_store：加大页缓存，临时表放内存
+同步引擎在线程中使用（asyncio.to_thread、FastAPI 的同步接口），连接池按线程并发度设置。
+设置 LIUYAO_DB_ASYNC=1 时另建 aiosqlite 异步引擎，认证查询直接在事件循环中 await，不再占用线程
+（需安装 aiosqlite 与 greenlet，目前只支持 SQLite 地址）。
+  LIUYAO_DATABASE_URL       数据库地址（默认 sqlite:///<仓库根目录>/liuyao_api.db）
+  LIUYAO_DB_POOL_SIZE       连接池常驻连接数（默认 8）
+  LIUYAO_DB_MAX_OVERFLOW    高峰时额外允许的连接数（默认 16）
+  LIUYAO_DB_POOL_TIMEOUT    等待空闲连接的秒数（默认 10）
+  LIUYAO_DB_BUSY_TIMEOUT    SQLite 等待写锁的毫秒数（默认 5000）
+  LIUYAO_DB_CACHE_KB        SQLite 每个连接的页缓存大小，单位 KB（默认 16384）
+  LIUYAO_DB_ASYNC           是否启用 aiosqlite 异步引擎（默认 0）
+"""
+import os
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import URL, Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-# 使用 SQLite
-DATABASE_URL = "sqlite:///./liuyao_api.db"
+# 默认固定为仓库根目录下的 liuyao_api.db，不随工作目录变化
+# （服务在 app 目录下启动，create_api_key.py 在仓库根目录运行，两者须指向同一个库）
+DEFAULT_DATABASE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'liuyao_api.db')
+DATABASE_URL = os.getenv("LIUYAO_DATABASE_URL", f"sqlite:///{DEFAULT_DATABASE_PATH}")
+
+DB_POOL_SIZE = int(os.getenv("LIUYAO_DB_POOL_SIZE", "8"))
+DB_MAX_OVERFLOW = int(os.getenv("LIUYAO_DB_MAX_OVERFLOW", "16"))
+DB_POOL_TIMEOUT = float(os.getenv("LIUYAO_DB_POOL_TIMEOUT", "10"))
+DB_BUSY_TIMEOUT = int(os.getenv("LIUYAO_DB_BUSY_TIMEOUT", "5000"))
+DB_CACHE_KB = int(os.getenv("LIUYAO_DB_CACHE_KB", "16384"))
+DB_ASYNC = os.getenv("LIUYAO_DB_ASYNC", "0") == "1"
+
+
+def _is_sqlite_file(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """connect 事件：每个新建的 SQLite 连接执行一次"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT}")
+        cursor.execute(f"PRAGMA cache_size=-{DB_CACHE_KB}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA foreign_keys=ON")
+    finally:
+        cursor.close()
+
+
+def _engine_args(url: URL) -> Dict[str, Any]:
+    """同步与异步引擎共用的参数"""
+    pool_args = dict(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    if url.get_backend_name() != "sqlite":
+        return dict(pool_args, pool_pre_ping=True)
+    # check_same_thread: 连接由连接池在线程间传递，同一时刻只有一个线程使用
+    args: Dict[str, Any] = {"connect_args": {"check_same_thread": False}}
+    if _is_sqlite_file(url):
+        # 内存库使用 SQLAlchemy 默认的单连接池，不接受连接池参数
+        args.update(pool_args)
+    return args
+
+
+def make_engine(database_url: str = DATABASE_URL) -> Engine:
+    url = make_url(database_url)
+    engine = create_engine(url, **_engine_args(url))
+    if _is_sqlite_file(url):
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False} # check_same_thread is for SQLite only
-)
+def make_async_engine(database_url: str = DATABASE_URL):
+    """把 SQLite 地址换成 aiosqlite 驱动，建立异步引擎，连接设置与同步引擎相同"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = make_url(database_url)
+    if url.get_backend_name() != "sqlite":
+        raise ValueError(f"异步引擎目前只支持 SQLite: {url.render_as_string(hide_password=True)}")
+    url = url.set(drivername="sqlite+aiosqlite")
+    engine = create_async_engine(url, **_engine_args(url))
+    if _is_sqlite_file(url):
+        event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
+
+engine = make_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    async_engine = make_async_engine()
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+else:
+    async_engine = None
+    AsyncSessionLocal = None
+
+
+def init_db():
+    """创建缺少的表，并给已有的表补上模型中新增的可空列与索引"""
+    import models  # 导入即把模型注册到 Base.metadata
+    Base.metadata.create_all(bind=engine)
+    _upgrade_existing_tables()
+
+
+def _upgrade_existing_tables():
+    # create_all 跳过已有的表（连同其索引）；新增的列都是可空列，可直接 ALTER TABLE ADD COLUMN
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(bind=conn)
+
+
+async def dispose_engines():
+    """关闭连接池中的连接（服务关闭时调用）"""
+    if async_engine is not None:
+        await async_engine.dispose()
+    engine.dispose()
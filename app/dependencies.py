@@ -1,7 +1,8 @@
 from fastapi import Header, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from . import crud
-from .database import SessionLocal
+import crud
+import database
+from database import SessionLocal
 
 def get_db():
     db = SessionLocal()
@@ -10,6 +11,13 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """异步会话（需 LIUYAO_DB_ASYNC=1），供 async 接口访问数据库而不阻塞事件循环"""
+    if database.AsyncSessionLocal is None:
+        raise RuntimeError("异步数据库引擎未启用，请设置 LIUYAO_DB_ASYNC=1")
+    async with database.AsyncSessionLocal() as db:
+        yield db
+
 async def get_api_key_from_header(
     x_api_key: str = Header(..., description="Your unique API key."),
     db: Session = Depends(get_db)
@@ -0,0 +1,278 @@
+# app/history.py
+"""
+排盘记录（写后回写）
+
+每个返回给调用方的卦盘（单次、批量中的每项、时间区间中的每个时刻）记一行到 divinations 表。
+请求路径上只把记录放入有界队列；后台线程从队列中取出当前已有的全部记录（最多 LIUYAO_HISTORY_BATCH_SIZE 条），
+以多行 INSERT 在一个事务中写入。负载低时每批一两条、几乎没有延迟，负载高时批次自然变大。
+队列满时按 LIUYAO_HISTORY_POLICY 处理：
+  drop   丢弃该条记录并计数（默认，请求延迟不受数据库影响）
+  block  等待队列腾出空间，最多 LIUYAO_HISTORY_BLOCK_TIMEOUT 秒，超时仍丢弃
+         （事件循环上的调用改在线程中等待，不阻塞其他请求；批量、时间区间的各条记录
+         共用同一个期限，整个请求最多等待一次 LIUYAO_HISTORY_BLOCK_TIMEOUT）
+服务关闭时停止接收并写完队列中剩余的记录。写入失败的批次记入日志并计数，不重试。
+查询（GET /divinations）按 (created_at, id) 倒序、以游标分页，边从数据库读取边输出 JSON。
+  LIUYAO_HISTORY                  是否记录（默认 1）
+  LIUYAO_HISTORY_QUEUE_SIZE       队列长度（默认 10000）
+  LIUYAO_HISTORY_BATCH_SIZE       每个事务最多写入的条数（默认 1000）
+  LIUYAO_HISTORY_POLICY           队列满时的处理方式：drop 或 block（默认 drop）
+  LIUYAO_HISTORY_BLOCK_TIMEOUT    block 时的最长等待秒数（默认 1）
+"""
+import asyncio
+import base64
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import Select
+
+import crud
+from database import SessionLocal
+from services.enhanced_divination_service import dumps_json
+from services.metrics import (
+    HISTORY_DROPPED, HISTORY_FLUSH_LATENCY, HISTORY_QUEUE_DEPTH, HISTORY_WRITE_ERRORS, HISTORY_WRITTEN,
+)
+
+logger = logging.getLogger(__name__)
+
+HISTORY_ENABLED = os.getenv("LIUYAO_HISTORY", "1") == "1"
+HISTORY_QUEUE_SIZE = int(os.getenv("LIUYAO_HISTORY_QUEUE_SIZE", "10000"))
+HISTORY_BATCH_SIZE = int(os.getenv("LIUYAO_HISTORY_BATCH_SIZE", "1000"))
+HISTORY_POLICY = os.getenv("LIUYAO_HISTORY_POLICY", "drop")
+HISTORY_BLOCK_TIMEOUT = float(os.getenv("LIUYAO_HISTORY_BLOCK_TIMEOUT", "1"))
+
+
+class HistoryEntry(NamedTuple):
+    key_id: int
+    divination_type: str            # time / manual / name / basic
+    params: Optional[Dict[str, Any]]  # 起卦参数（不含时间），时间起卦为 None
+    ben_code: int
+    bian_code: int
+    moving_mask: int
+    target_time: datetime
+    created_at: datetime            # 返回结果的时刻（UTC）
+
+
+def divination_params(manual_yaos=None, upper_original=None, lower_original=None,
+                      upper_changed=None, lower_changed=None) -> Optional[Dict[str, Any]]:
+    """请求中实际给出的起卦参数"""
+    if manual_yaos:
+        return {"manual_yaos": list(manual_yaos)}
+    names = {"upper_original": upper_original, "lower_original": lower_original,
+             "upper_changed": upper_changed, "lower_changed": lower_changed}
+    names = {name: value for name, value in names.items() if value is not None}
+    return names or None
+
+
+def make_entry(key_id: int, divination_type: str, params: Optional[Dict[str, Any]],
+               ben: int, mask: int, target_time: datetime) -> HistoryEntry:
+    return HistoryEntry(key_id, divination_type, params, ben, ben ^ mask, mask, target_time,
+                        datetime.now(timezone.utc).replace(tzinfo=None))
+
+
+def _sqlite_datetime(value: datetime) -> str:
+    """与 SQLAlchemy 在 SQLite 中保存 DateTime 的格式一致（不含时区）"""
+    return value.replace(tzinfo=None).isoformat(sep=' ', timespec='microseconds')
+
+
+def to_utc_naive(value: datetime) -> datetime:
+    """带时区的时间换算为 UTC 并去掉时区，与 created_at 的保存方式一致；不带时区的视为 UTC"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def encode_cursor(created_at: datetime, record_id: int) -> str:
+    """把一页最后一条记录的 (created_at, id) 编成不透明的游标"""
+    raw = f"{_sqlite_datetime(created_at)}|{record_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """encode_cursor 的逆操作，格式不对时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, record_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(record_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"无效的游标: {cursor}") from e
+
+
+def _record_json(row) -> bytes:
+    body = dumps_json({
+        "id": row.id,
+        "key_id": row.key_id,
+        "divination_type": row.divination_type,
+        "ben_code": row.ben_code,
+        "bian_code": row.bian_code,
+        "moving_mask": row.moving_mask,
+        "target_time": row.target_time.isoformat(),
+        "created_at": row.created_at.isoformat(),
+    })
+    # params 在库中已是 JSON 文本，直接拼入，不再解析一遍
+    params = row.params.encode("utf-8") if row.params else b"null"
+    return body[:-1] + b',"params":' + params + b"}"
+
+
+def stream_records(stmt: Select, limit: int, chunk_size: int = 100) -> Iterator[bytes]:
+    """
+    执行 crud.divination_records_query（limit 须为 limit + 1）并流式输出
+    {"items": [...], "next_cursor": ...}；多取的一行只用来判断是否还有下一页。
+    每 chunk_size 条输出一次，StreamingResponse 在线程中迭代时不必每行切换一次线程
+    """
+    with SessionLocal() as db:
+        result = db.execute(stmt)
+        chunk = [b'{"items":[']
+        last = None
+        next_cursor = None
+        for count, row in enumerate(result):
+            if count == limit:
+                next_cursor = encode_cursor(last.created_at, last.id)
+                break
+            if count:
+                chunk.append(b",")
+            chunk.append(_record_json(row))
+            last = row
+            if len(chunk) >= chunk_size * 2:
+                yield b"".join(chunk)
+                chunk = []
+        result.close()
+    chunk.append(b'],"next_cursor":' + dumps_json(next_cursor) + b"}")
+    yield b"".join(chunk)
+
+
+_STOP = object()
+
+
+class HistoryWriter:
+    """有界队列 + 单个写入线程"""
+
+    def __init__(self, maxsize: int = HISTORY_QUEUE_SIZE, batch_size: int = HISTORY_BATCH_SIZE,
+                 policy: str = HISTORY_POLICY, block_timeout: float = HISTORY_BLOCK_TIMEOUT):
+        if policy not in ("drop", "block"):
+            raise ValueError(f"LIUYAO_HISTORY_POLICY 只支持 drop、block: {policy}")
+        self.batch_size = batch_size
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._queue: "queue.Queue" = queue.Queue(maxsize)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="liuyao-history", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 30) -> None:
+        """停止接收新记录，写完队列中剩余的记录后返回"""
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.warning("排盘记录未能在关闭前写完", extra={"pending": self._queue.qsize()})
+
+    def record(self, entry: HistoryEntry) -> bool:
+        """放入队列（可在任意线程调用，block 策略下可能等待）；未启动或丢弃时返回 False"""
+        return self.record_many((entry,), self.deadline()) == 1
+
+    async def record_async(self, entry: HistoryEntry) -> bool:
+        """事件循环上使用：队列有空位时直接放入，需要等待时改在线程中等待"""
+        if self._thread is None:
+            return False
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            if self.policy != "block" or not await asyncio.to_thread(self._put_blocking, entry):
+                HISTORY_DROPPED.inc()
+                return False
+        HISTORY_QUEUE_DEPTH.set(self._queue.qsize())
+        return True
+
+    def deadline(self) -> float:
+        """一个请求的等待期限（time.monotonic()），传给该请求的各次 record_many"""
+        return time.monotonic() + self.block_timeout
+
+    def record_many(self, entries: Iterable[HistoryEntry], deadline: float) -> int:
+        """
+        放入一个请求的多条记录（在线程中调用），返回放入的条数
+        block 策略下只等到 deadline 为止，过期后队列满即丢弃，单个请求的总等待不超过一次 block_timeout
+        """
+        if self._thread is None:
+            return 0
+        put = dropped = 0
+        for entry in entries:
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                remaining = deadline - time.monotonic() if self.policy == "block" else 0
+                if remaining <= 0 or not self._put_blocking(entry, remaining):
+                    dropped += 1
+                    continue
+            put += 1
+        if dropped:
+            HISTORY_DROPPED.inc(dropped)
+        HISTORY_QUEUE_DEPTH.set(self._queue.qsize())
+        return put
+
+    def _put_blocking(self, entry: HistoryEntry, timeout: Optional[float] = None) -> bool:
+        try:
+            self._queue.put(entry, timeout=self.block_timeout if timeout is None else timeout)
+            return True
+        except queue.Full:
+            return False
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch: List[HistoryEntry] = []
+            entry = self._queue.get()
+            # 等到第一条后取出队列中已有的全部记录，每满一批写入一次；
+            # 收到停止信号后同样取到队列为空为止
+            while True:
+                if entry is _STOP:
+                    stopping = True
+                else:
+                    batch.append(entry)
+                    if len(batch) >= self.batch_size:
+                        self._write(batch)
+                        batch = []
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: List[HistoryEntry]) -> None:
+        started = time.perf_counter()
+        # 顺序同 crud.DIVINATION_RECORD_COLUMNS
+        rows = [(entry.key_id, entry.divination_type,
+                 json.dumps(entry.params, ensure_ascii=False) if entry.params else None,
+                 entry.ben_code, entry.bian_code, entry.moving_mask,
+                 _sqlite_datetime(entry.target_time), _sqlite_datetime(entry.created_at))
+                for entry in batch]
+        try:
+            with SessionLocal() as db:
+                crud.add_divination_records(db, rows)
+            HISTORY_WRITTEN.inc(len(rows))
+        except Exception:
+            HISTORY_WRITE_ERRORS.inc(len(rows))
+            logger.exception("写入排盘记录失败", extra={"rows": len(rows)})
+        HISTORY_FLUSH_LATENCY.observe(time.perf_counter() - started)
+        HISTORY_QUEUE_DEPTH.set(self._queue.qsize())
+
+
+HISTORY_WRITER = HistoryWriter()
@@ -1,75 +1,404 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, Query
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from schemas import DivinationRequest, DivinationResponse, EnhancedDivinationRequest, EnhancedDivinationResponse
+from schemas import (
+    DivinationRequest, DivinationResponse, EnhancedDivinationRequest, EnhancedDivinationResponse,
+    EnhancedDivinationBatchRequest, EnhancedDivinationBatchResponse,
+    ApiKeyCreateRequest, ApiKeyCreated, ApiKeyInfo, ApiKeyRateLimit
+)
 from services.divination_service import perform_divination
-from services.enhanced_divination_service import (
-    perform_time_divination,
-    perform_manual_divination,
-    perform_name_divination
+from services.enhanced_divination_service import DivinationInputError, divination_job, iter_time_divination_range
+from services.executor import ENGINE_EXECUTOR, ExecutorBusy
+from services.metrics import (
+    DIVINATION_LATENCY, DIVINATION_REQUESTS, METRICS_CONTENT_TYPE, RATE_LIMITED,
+    divination_type_label, mark_process_dead, render_metrics
+)
+from services.batch_service import BATCH_MAX_SIZE, make_item, render_batch, run_batch, shutdown_pool
+from services.result_cache import RESULT_CACHE
+from services.prewarm import PREWARM_ENABLED, prewarm_loop
+from services.logging_setup import add_request_fields, bind_request, new_request_id, setup_logging, shutdown_logging
+from auth import API_KEY_CACHE, ApiKeyPrincipal, authenticate, remember_key, revision_poll_loop
+from database import SessionLocal, dispose_engines, init_db
+import crud
+from services.rate_limiter import RATE_LIMITER, resolve_limit, retry_after_header
+from usage import USAGE_RECORDER, flush_usage, usage_flush_loop
+from history import (
+    HISTORY_ENABLED, HISTORY_WRITER, decode_cursor, divination_params, make_entry, stream_records, to_utc_naive,
 )
+from services.profiling import PROFILE_ENABLED, list_profiles, profile_in_worker, profile_path, profiling_middleware
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime, timedelta
+from typing import List, Optional
+import asyncio
+import hmac
+import logging
+import secrets
 import os
+import time
+
+# 时间区间排盘的步长与单次最多条数
+RANGE_STEPS = {
+    "shichen": timedelta(hours=2),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+RANGE_MAX_POINTS = int(os.getenv("LIUYAO_RANGE_MAX_POINTS", "1000000"))
+RANGE_HISTORY_CHUNK = 256
+
+logger = logging.getLogger("liuyao.api")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    启动时配置日志、建表并开启后台任务（预热、认证缓存失效检查、用量写入、排盘记录写入），
+    关闭时取消任务、写入剩余用量与排盘记录、关闭数据库连接并写出剩余日志
+    """
+    setup_logging()
+    await asyncio.to_thread(init_db)
+    if HISTORY_ENABLED:
+        HISTORY_WRITER.start()
+    tasks = [asyncio.create_task(revision_poll_loop()), asyncio.create_task(usage_flush_loop())]
+    if PREWARM_ENABLED:
+        tasks.append(asyncio.create_task(prewarm_loop()))
+    yield
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        with suppress(asyncio.CancelledError):
+            await task
+    await flush_usage()
+    await asyncio.to_thread(HISTORY_WRITER.stop)
+    await dispose_engines()
+    ENGINE_EXECUTOR.shutdown()
+    shutdown_pool()
+    mark_process_dead()
+    shutdown_logging()
+
+app = FastAPI(title="六爻排盘API", version="1.0.0", lifespan=lifespan)
+
+if PROFILE_ENABLED:
+    # 先注册的中间件在内层，剖析中间件才能取得外层 request_context 绑定的请求 ID 与起卦类型
+    app.middleware("http")(profiling_middleware)
+    ENGINE_EXECUTOR.task_wrapper = profile_in_worker
 
-app = FastAPI(title="六爻排盘API", version="1.0.0")
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """
+    为每个请求绑定请求 ID（沿用客户端的 X-Request-ID，否则生成），并记录一条访问日志
+    成功请求的访问日志可按 LIUYAO_LOG_SAMPLE_RATE 采样；流式响应的耗时只计到开始返回为止
+    """
+    request_id = request.headers.get("x-request-id") or new_request_id()
+    fields = bind_request(request_id)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        level = logging.INFO if status < 400 else logging.WARNING if status < 500 else logging.ERROR
+        logger.log(level, "请求完成", extra={
+            "method": request.method, "path": request.url.path, "status": status,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            "sample": status < 400, **fields,
+        })
+    response.headers["X-Request-ID"] = request_id
+    return response
 
 # 安全认证
 security = HTTPBearer()
 
-def verify_api_key(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """验证API密钥"""
-    api_key = os.getenv("API_KEY", "your-secret-api-key")
-    if credentials.credentials != api_key:
+async def verify_api_key(credentials: HTTPAuthorizationCredentials = Depends(security)) -> ApiKeyPrincipal:
+    """验证API密钥（api_keys 表或环境变量 API_KEY），缓存命中时不访问数据库"""
+    principal = await authenticate(credentials.credentials)
+    if principal is None:
         raise HTTPException(status_code=401, detail="Invalid API key")
-    return credentials.credentials
+    return principal
+
+def charge_rate_limit(api_key: ApiKeyPrincipal, cost: float = 1) -> None:
+    """
+    按 Key 限流并计入用量，超出时返回 429
+    :param cost: 消耗的令牌数（批量为条目数、区间为时刻数），全额扣除；
+                 超过该 Key 的 burst 时桶满也无法通过，直接返回 413
+    """
+    limit = resolve_limit(api_key.rate_limit, api_key.rate_burst)
+    if limit is not None and cost > limit[1]:
+        USAGE_RECORDER.record(api_key.id, allowed=False)
+        raise HTTPException(status_code=413,
+                            detail=f"单次请求消耗 {cost:g} 个令牌，超过该 Key 的突发容量 {limit[1]:g}，请拆分请求")
+    wait = RATE_LIMITER.acquire(api_key.id, *limit, cost=cost) if limit is not None else 0.0
+    USAGE_RECORDER.record(api_key.id, allowed=not wait)
+    if wait:
+        RATE_LIMITED.inc()
+        raise HTTPException(status_code=429, detail="请求过于频繁",
+                            headers={"Retry-After": retry_after_header(wait)})
+
+async def rate_limited_key(api_key: ApiKeyPrincipal = Depends(verify_api_key)) -> ApiKeyPrincipal:
+    """单次排盘接口的认证：每个请求消耗一个令牌"""
+    charge_rate_limit(api_key)
+    return api_key
+
+def verify_admin_key(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """管理接口使用单独的 LIUYAO_ADMIN_KEY，未设置时管理接口不可用"""
+    admin_key = os.getenv("LIUYAO_ADMIN_KEY")
+    if not admin_key:
+        raise HTTPException(status_code=403, detail="管理接口未启用")
+    if not hmac.compare_digest(credentials.credentials.encode(), admin_key.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
+
+metrics_security = HTTPBearer(auto_error=False)
+
+def verify_metrics_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(metrics_security)):
+    """
+    /metrics 不使用调用方的 API Key（抓取不应计入限流与用量）：
+    设置 LIUYAO_METRICS_TOKEN 时须携带该令牌，未设置时不认证，供内网的 Prometheus 直接抓取
+    """
+    token = os.getenv("LIUYAO_METRICS_TOKEN")
+    if not token:
+        return
+    if credentials is None or not hmac.compare_digest(credentials.credentials.encode(), token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+def _busy(e: ExecutorBusy) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+def _observe(type_label: str, status: int, started: float) -> None:
+    DIVINATION_REQUESTS.labels(type_label, str(status)).inc()
+    DIVINATION_LATENCY.labels(type_label).observe(time.perf_counter() - started)
 
 @app.post("/divination", response_model=DivinationResponse)
 async def create_divination(
     request: DivinationRequest,
-    api_key: str = Depends(verify_api_key)
+    api_key: ApiKeyPrincipal = Depends(rate_limited_key)
 ):
     """
     六爻排盘API（原版）
     """
+    started = time.perf_counter()
+    status = 500
     try:
-        result = perform_divination(request.target_time)
-        return DivinationResponse(**result)
+        result = await ENGINE_EXECUTOR.run(perform_divination, request.target_time)
+        response = DivinationResponse(**result)
+        status = 200
+        hexagram = result["hexagram"]
+        ben = int(hexagram["original"]["yao_binary"], 2)
+        await HISTORY_WRITER.record_async(make_entry(
+            api_key.id, "basic", None, ben, ben ^ int(hexagram["changed"]["yao_binary"], 2),
+            request.target_time or datetime.now()))
+        return response
+    except ExecutorBusy as e:
+        status = 503
+        raise _busy(e)
     except Exception as e:
+        logger.exception("排盘失败")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        _observe("basic", status, started)
 
 @app.post("/enhanced-divination", response_model=EnhancedDivinationResponse)
 async def create_enhanced_divination(
     request: EnhancedDivinationRequest,
-    api_key: str = Depends(verify_api_key)
+    api_key: ApiKeyPrincipal = Depends(rate_limited_key)
 ):
     """
     增强型六爻排盘API
     支持三种起卦方式：时间起卦、手工指定、卦名起卦
     返回完整的六爻盘信息，包括纳甲、六亲、六神、世应等
+    响应体由预编码的卦象 JSON 片段直接拼接，结构同 EnhancedDivinationResponse
+    缓存命中时直接在事件循环中返回，未命中时交给排盘线程池计算
     """
+    started = time.perf_counter()
+    status = 500
     try:
-        print(f"收到请求，起卦类型: {request.divination_type}")
-        if request.divination_type in ["时间起卦", "time"]:
-            result = perform_time_divination(request.target_time)
-        elif request.divination_type in ["手工指定", "manual"]:
-            if not request.manual_yaos:
-                raise HTTPException(status_code=400, detail="手工指定模式需要提供manual_yaos参数")
-            result = perform_manual_divination(request.manual_yaos, request.target_time)
-        elif request.divination_type in ["卦名起卦", "name"]:
-            if not all([request.upper_original, request.lower_original, 
-                       request.upper_changed, request.lower_changed]):
-                raise HTTPException(status_code=400, detail="卦名起卦模式需要提供所有卦名参数")
-            result = perform_name_divination(
-                request.upper_original, request.lower_original,
-                request.upper_changed, request.lower_changed,
-                request.target_time
-            )
-        else:
-            print(f"不支持的起卦类型: {request.divination_type}")
-            raise HTTPException(status_code=400, detail="不支持的起卦类型")
-        
-        return EnhancedDivinationResponse(**result)
+        add_request_fields(divination_type=request.divination_type)
+        job = divination_job(
+            request.divination_type, request.target_time, request.manual_yaos,
+            request.upper_original, request.lower_original,
+            request.upper_changed, request.lower_changed
+        )
+        result = job.cached()
+        add_request_fields(cache="hit" if result is not None else "miss")
+        if result is None:
+            result = await ENGINE_EXECUTOR.run(job.run)
+        response = Response(content=result.to_json(), media_type="application/json")
+        status = 200
+        await HISTORY_WRITER.record_async(make_entry(
+            api_key.id, divination_type_label(request.divination_type),
+            divination_params(request.manual_yaos, request.upper_original, request.lower_original,
+                              request.upper_changed, request.lower_changed),
+            result.chart.ben, result.chart.mask, result.target_time))
+        return response
+    except ExecutorBusy as e:
+        status = 503
+        raise _busy(e)
+    except DivinationInputError as e:
+        status = 400
+        logger.warning("请求参数错误", extra={"error": str(e)})
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"API错误: {str(e)}")
+        logger.exception("排盘失败")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        _observe(divination_type_label(request.divination_type), status, started)
+
+@app.post("/enhanced-divination/batch", response_model=EnhancedDivinationBatchResponse)
+def create_enhanced_divination_batch(
+    request: EnhancedDivinationBatchRequest,
+    api_key: ApiKeyPrincipal = Depends(verify_api_key)
+):
+    """
+    批量增强型六爻排盘API
+    条目可混合三种起卦方式，结果按请求顺序返回，单项错误记录在该项的 error 中
+    相同参数的条目只计算一次，条目较多时分发到进程池并行计算
+    """
+    if len(request.items) > BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"单批最多 {BATCH_MAX_SIZE} 条")
+    charge_rate_limit(api_key, len(request.items))
+    items = [
+        make_item(item.divination_type, item.target_time, item.manual_yaos,
+                  item.upper_original, item.lower_original,
+                  item.upper_changed, item.lower_changed)
+        for item in request.items
+    ]
+    results = run_batch(items)
+    now = datetime.now()
+    entries = []
+    for item, (status, _, chart) in zip(items, results):
+        if chart is not None:
+            divination_type, target_time, manual_yaos, *names = item
+            entries.append(make_entry(
+                api_key.id, divination_type_label(divination_type), divination_params(manual_yaos, *names),
+                chart[0], chart[1], target_time or now))
+    HISTORY_WRITER.record_many(entries, HISTORY_WRITER.deadline())
+    return Response(content=render_batch(results), media_type="application/json")
+
+@app.get("/enhanced-divination/range")
+def stream_divination_range(
+    start: datetime,
+    end: datetime,
+    step: str = Query("shichen", description="步长：shichen（时辰）、hour、day"),
+    api_key: ApiKeyPrincipal = Depends(verify_api_key)
+):
+    """
+    时间区间排盘API
+    对 [start, end] 内每个步长的时刻做时间起卦，以 NDJSON 流式返回，每行一个排盘结果
+    """
+    if step not in RANGE_STEPS:
+        raise HTTPException(status_code=400, detail="step 只支持 shichen、hour、day")
+    # 与排盘引擎一致按字面时间处理：去掉时区后再比较，一端带时区、一端不带时不会出错
+    start, end = start.replace(tzinfo=None), end.replace(tzinfo=None)
+    if end < start:
+        raise HTTPException(status_code=400, detail="end 不能早于 start")
+    points = (end - start) // RANGE_STEPS[step] + 1
+    if points > RANGE_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"单次最多 {RANGE_MAX_POINTS} 个时刻")
+    charge_rate_limit(api_key, points)
+
+    def generate():
+        # 排盘记录攒满一块再放入队列，整个请求共用一个等待期限；客户端中途断开时也记下已返回的部分
+        deadline = HISTORY_WRITER.deadline()
+        entries = []
+        try:
+            for result in iter_time_divination_range(start, end, RANGE_STEPS[step]):
+                entries.append(make_entry(api_key.id, "time", None, result.chart.ben, result.chart.mask,
+                                          result.target_time))
+                if len(entries) >= RANGE_HISTORY_CHUNK:
+                    HISTORY_WRITER.record_many(entries, deadline)
+                    entries = []
+                yield result.to_json() + b"\n"
+        finally:
+            HISTORY_WRITER.record_many(entries, deadline)
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@app.get("/divinations", dependencies=[Depends(verify_admin_key)])
+def list_divinations(
+    key_id: Optional[int] = None,
+    ben_code: Optional[int] = Query(None, ge=0, le=63, description="本卦编码，即 int(yao_binary, 2)"),
+    divination_type: Optional[str] = Query(None, description="time、manual、name、basic"),
+    start: Optional[datetime] = Query(None, description="记录时间下限（含），不带时区视为 UTC"),
+    end: Optional[datetime] = Query(None, description="记录时间上限（不含），不带时区视为 UTC"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor")
+):
+    """
+    排盘记录查询API（管理接口）
+    按记录时间倒序返回 {"items": [...], "next_cursor": ...}，next_cursor 为 null 表示没有下一页。
+    用游标而不是 OFFSET 翻页，每页只从索引中的游标位置往后读 limit 条，与翻到第几页、表有多大无关
+    """
+    try:
+        before = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="cursor 无效")
+    stmt = crud.divination_records_query(
+        key_id=key_id, ben_code=ben_code, divination_type=divination_type,
+        start=to_utc_naive(start) if start else None, end=to_utc_naive(end) if end else None,
+        before=before, limit=limit + 1)
+    return StreamingResponse(stream_records(stmt, limit), media_type="application/json")
+
+@app.get("/cache-stats")
+async def cache_stats(api_key: ApiKeyPrincipal = Depends(verify_api_key)):
+    """排盘结果缓存的命中统计"""
+    return RESULT_CACHE.stats()
+
+@app.get("/executor-stats")
+async def executor_stats(api_key: ApiKeyPrincipal = Depends(verify_api_key)):
+    """排盘线程池的占用情况与排队等待时间"""
+    return ENGINE_EXECUTOR.stats()
+
+@app.get("/metrics", dependencies=[Depends(verify_metrics_token)])
+async def metrics():
+    """Prometheus 文本格式的指标；多进程部署时汇总所有 worker（见 services/metrics.py）"""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+@app.post("/admin/api-keys", response_model=ApiKeyCreated, dependencies=[Depends(verify_admin_key)])
+def admin_create_api_key(request: ApiKeyCreateRequest):
+    """新增 API Key，明文只在此次响应中返回"""
+    with SessionLocal() as db:
+        db_key = crud.create_api_key(db, key=secrets.token_urlsafe(32), owner=request.owner,
+                                     rate_limit=request.rate_limit, rate_burst=request.rate_burst)
+        remember_key(db_key.key)
+        return ApiKeyCreated(id=db_key.id, owner=db_key.owner, key=db_key.key)
+
+@app.get("/admin/api-keys", response_model=List[ApiKeyInfo], dependencies=[Depends(verify_admin_key)])
+def admin_list_api_keys():
+    """列出全部 API Key（不含明文）"""
+    with SessionLocal() as db:
+        return [ApiKeyInfo.model_validate(db_key) for db_key in crud.list_api_keys(db)]
+
+@app.put("/admin/api-keys/{key_id}/rate-limit", response_model=ApiKeyInfo, dependencies=[Depends(verify_admin_key)])
+def admin_set_rate_limit(key_id: int, request: ApiKeyRateLimit):
+    """修改 Key 的限流设置（字段为空则恢复默认），各进程在下次检查修订号时生效"""
+    with SessionLocal() as db:
+        db_key = crud.set_rate_limit(db, key_id, request.rate_limit, request.rate_burst)
+        if db_key is None:
+            raise HTTPException(status_code=404, detail="API Key 不存在")
+        API_KEY_CACHE.invalidate_id(key_id)
+        RATE_LIMITER.reset(key_id)
+        return ApiKeyInfo.model_validate(db_key)
+
+@app.delete("/admin/api-keys/{key_id}", response_model=ApiKeyInfo, dependencies=[Depends(verify_admin_key)])
+def admin_deactivate_api_key(key_id: int):
+    """停用 API Key，本进程的认证缓存立即失效，其他进程在下次检查修订号时失效"""
+    with SessionLocal() as db:
+        db_key = crud.deactivate_api_key(db, key_id)
+        if db_key is None:
+            raise HTTPException(status_code=404, detail="API Key 不存在")
+        API_KEY_CACHE.invalidate_id(key_id)
+        return ApiKeyInfo.model_validate(db_key)
+
+if PROFILE_ENABLED:
+    @app.get("/profiles")
+    async def get_profiles(limit: int = Query(50, ge=1, le=1000), api_key: ApiKeyPrincipal = Depends(verify_api_key)):
+        """最近的请求剖析文件（需 LIUYAO_PROFILE=1）"""
+        return list_profiles(limit)
+
+    @app.get("/profiles/{name}")
+    async def download_profile(name: str, api_key: ApiKeyPrincipal = Depends(verify_api_key)):
+        """下载一份剖析文件"""
+        path = profile_path(name)
+        if path is None:
+            raise HTTPException(status_code=404, detail="剖析文件不存在")
+        return FileResponse(path, filename=name)
 
 @app.get("/")
 async def root():
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, Text, Index
 from sqlalchemy.sql import func
-from .database import Base
+from database import Base
 
 class ApiKey(Base):
     __tablename__ = "api_keys"
@@ -9,4 +9,55 @@ class ApiKey(Base):
     key = Column(String, unique=True, index=True, nullable=False)
     owner = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # 限流设置，为空时使用 LIUYAO_RATE_LIMIT / LIUYAO_RATE_BURST；rate_limit 为 0 表示不限流
+    rate_limit = Column(Float, nullable=True)   # 每秒请求数
+    rate_burst = Column(Float, nullable=True)   # 突发容量
+
+class ApiKeyRevision(Base):
+    """
+    api_keys 表的修订号，每次新增或停用 Key 时加一
+    各服务进程定期读取，发现变化即清空本进程的认证缓存
+    """
+    __tablename__ = "api_key_revision"
+
+    id = Column(Integer, primary_key=True)
+    revision = Column(Integer, nullable=False, default=0)
+
+class ApiKeyUsage(Base):
+    """
+    每个 Key 每小时的请求数，由各服务进程在内存中累计后定期批量写入（累加到已有的行）
+    key_id 为 0 表示环境变量 API_KEY
+    """
+    __tablename__ = "api_key_usage"
+
+    key_id = Column(Integer, primary_key=True)
+    period = Column(DateTime, primary_key=True)         # 所在小时的起点（UTC）
+    requests = Column(Integer, nullable=False, default=0)   # 放行的请求数
+    rejected = Column(Integer, nullable=False, default=0)   # 因限流返回 429 的请求数
+
+class DivinationRecord(Base):
+    """
+    每个返回给调用方的卦盘一行，由后台线程批量写入（见 history.py）
+    卦以 6 位编码保存（见 services/chart.py），bian_code = ben_code ^ moving_mask
+    查询按 (created_at, id) 倒序分页；SQLite 的索引条目末尾隐含 rowid（即 id），
+    按 Key、本卦、起卦类型或只按时间查询时沿下面的索引顺序读取，不扫表也不建临时 B 树排序；
+    索引不含 params 等列，不是覆盖索引，返回的每行仍按 rowid 回表读取完整记录
+    """
+    __tablename__ = "divinations"
+    __table_args__ = (
+        Index("ix_divinations_key_id_created_at", "key_id", "created_at"),
+        Index("ix_divinations_ben_code_created_at", "ben_code", "created_at"),
+        Index("ix_divinations_type_created_at", "divination_type", "created_at"),
+        Index("ix_divinations_created_at", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    key_id = Column(Integer, nullable=False)                # 0 表示环境变量 API_KEY
+    divination_type = Column(String, nullable=False)        # time / manual / name / basic
+    params = Column(Text, nullable=True)                    # 起卦参数 JSON（不含时间）
+    ben_code = Column(Integer, nullable=False)
+    bian_code = Column(Integer, nullable=False)
+    moving_mask = Column(Integer, nullable=False)
+    target_time = Column(DateTime, nullable=False)          # 起卦时间
+    created_at = Column(DateTime, nullable=False)           # 返回结果的时刻（UTC）
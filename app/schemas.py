@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 
@@ -55,4 +55,43 @@ class EnhancedDivinationResponse(BaseModel):
     hexagram: Dict[str, Any]               # 卦象信息（包含original、changed、moving_line/moving_lines）
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class EnhancedDivinationBatchRequest(BaseModel):
+    """批量排盘请求，条目可混合三种起卦方式"""
+    items: List[EnhancedDivinationRequest]
+
+class BatchItemResult(BaseModel):
+    """批量排盘的单项结果"""
+    status: int                                         # 200 / 400 / 500
+    result: Optional[EnhancedDivinationResponse] = None # 成功时的排盘结果
+    error: Optional[str] = None                         # 失败时的错误信息
+
+class EnhancedDivinationBatchResponse(BaseModel):
+    """批量排盘响应，顺序与请求一致"""
+    results: List[BatchItemResult]
+
+class ApiKeyRateLimit(BaseModel):
+    """Key 的限流设置，为空时使用服务的默认值；rate_limit 为 0 表示不限流"""
+    rate_limit: Optional[float] = Field(None, ge=0, description="每秒请求数")
+    rate_burst: Optional[float] = Field(None, ge=1, description="突发容量")
+
+class ApiKeyCreateRequest(ApiKeyRateLimit):
+    owner: str
+
+class ApiKeyInfo(BaseModel):
+    id: int
+    owner: str
+    is_active: bool
+    created_at: Optional[datetime] = None
+    rate_limit: Optional[float] = None
+    rate_burst: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+class ApiKeyCreated(BaseModel):
+    # 明文 Key 只在创建时返回一次
+    id: int
+    owner: str
+    key: str
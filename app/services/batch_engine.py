@@ -0,0 +1,133 @@
+# app/services/batch_engine.py
+"""
+向量化的批量时间起卦
+
+输入一组时刻（datetime 序列或 datetime64 数组），以 NumPy 数组运算一次性得到
+农历日期、四柱甲子序号、上下卦、动爻以及本卦/变卦编码，结果为等长的平行数组。
+  - 日柱、时柱：儒略日数取模（见 ganzhi.py）
+  - 年柱、月柱、农历日期：使用 table 后端时对节/朔日表做 searchsorted，
+    其余情况（lunar_python 后端或超出表范围）逐个回退到当前农历后端
+单次的时间起卦（enhanced_divination_service）同样经由这里计算。
+"""
+from datetime import datetime
+from typing import NamedTuple, Sequence, Union
+
+import numpy as np
+
+from .calendar_backend import TableBackend, get_calendar_backend
+from .chart import TRIGRAM_CODES
+from .ganzhi import JDN_OFFSET, JIAZI
+
+# date(1970, 1, 1).toordinal()
+_EPOCH_ORDINAL = 719163
+
+_TRIGRAM_CODES = np.array(TRIGRAM_CODES, dtype=np.int64)
+_JIAZI_INDEX = {name: i for i, name in enumerate(JIAZI)}
+
+
+class TimeBatch(NamedTuple):
+    """批量时间起卦结果，各字段为等长数组"""
+    times: np.ndarray           # datetime64[s]
+    hour: np.ndarray            # 钟点（0-23）
+    lunar_year: np.ndarray      # 农历年
+    lunar_month: np.ndarray     # 农历月（闰月为负）
+    lunar_day: np.ndarray       # 农历日
+    year_gz: np.ndarray         # 年柱甲子序号（0-59，以立春交接时刻为准）
+    month_gz: np.ndarray        # 月柱甲子序号（以节交接时刻为准）
+    day_gz: np.ndarray          # 日柱甲子序号
+    hour_gz: np.ndarray         # 时柱甲子序号
+    year_zhi: np.ndarray        # 年支序数（1-12）
+    hour_zhi: np.ndarray        # 时支序数（1-12）
+    upper: np.ndarray           # 上卦卦序（1-8）
+    lower: np.ndarray           # 下卦卦序（1-8）
+    moving_line: np.ndarray     # 动爻（1-6）
+    ben: np.ndarray             # 本卦编码（0-63）
+    bian: np.ndarray            # 变卦编码（0-63）
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+
+def to_datetime64(times: Union[np.ndarray, Sequence[datetime]]) -> np.ndarray:
+    """转换为 datetime64[s]，带时区的 datetime 按字面时间处理（与 lunar_python 一致）"""
+    if isinstance(times, np.ndarray) and np.issubdtype(times.dtype, np.datetime64):
+        return times.astype('datetime64[s]')
+    return np.array([t.replace(tzinfo=None) for t in times], dtype='datetime64[s]')
+
+
+def _calendar_fields(secs: np.ndarray, ordinal: np.ndarray, times: np.ndarray):
+    """年柱、月柱与农历日期"""
+    n = len(secs)
+    lunar_year = np.empty(n, dtype=np.int64)
+    lunar_month = np.empty(n, dtype=np.int64)
+    lunar_day = np.empty(n, dtype=np.int64)
+    year_gz = np.empty(n, dtype=np.int64)
+    month_gz = np.empty(n, dtype=np.int64)
+
+    backend = get_calendar_backend()
+    if isinstance(backend, TableBackend):
+        in_range = ((ordinal >= backend._min_date.toordinal())
+                    & (ordinal <= backend._max_date.toordinal()))
+        jie_ts = np.frombuffer(backend.jie_ts, dtype='<i8')
+        month_start = np.frombuffer(backend.month_start, dtype='<i4')
+
+        i = np.searchsorted(jie_ts, secs[in_range], side='right') - 1
+        year_gz[in_range] = np.frombuffer(backend.jie_year, dtype=np.uint8)[i]
+        month_gz[in_range] = np.frombuffer(backend.jie_month, dtype=np.uint8)[i]
+
+        j = np.searchsorted(month_start, ordinal[in_range], side='right') - 1
+        lunar_year[in_range] = np.frombuffer(backend.month_year, dtype='<i2')[j]
+        lunar_month[in_range] = np.frombuffer(backend.month_num, dtype=np.int8)[j]
+        lunar_day[in_range] = ordinal[in_range] - month_start[j] + 1
+
+        fallback = backend.fallback
+        fallback_rows = np.flatnonzero(~in_range)
+    else:
+        fallback = backend
+        fallback_rows = range(n)
+
+    for k in fallback_rows:
+        dt = times[k].astype(datetime)
+        lunar_year[k], lunar_month[k], lunar_day[k] = fallback.lunar_date(dt)
+        year_name, month_name = fallback.year_month_ganzhi(dt)
+        year_gz[k] = _JIAZI_INDEX[year_name]
+        month_gz[k] = _JIAZI_INDEX[month_name]
+
+    return lunar_year, lunar_month, lunar_day, year_gz, month_gz
+
+
+def compute_time_batch(times: Union[np.ndarray, Sequence[datetime]]) -> TimeBatch:
+    """批量时间起卦"""
+    times = to_datetime64(times)
+    secs = times.astype(np.int64)
+    days = times.astype('datetime64[D]').astype(np.int64)
+    ordinal = days + _EPOCH_ORDINAL
+    hour = (secs - days * 86400) // 3600
+
+    # 日柱、时柱（五鼠遁，夜子时按次日日干起时干）
+    day_gz = (ordinal + JDN_OFFSET - 11) % 60
+    hour_zhi_index = (hour + 1) // 2 % 12
+    hour_gan = ((day_gz + (hour == 23)) % 10 % 5 * 2 + hour_zhi_index) % 10
+    hour_gz = (6 * hour_gan - 5 * hour_zhi_index) % 60
+
+    lunar_year, lunar_month, lunar_day, year_gz, month_gz = _calendar_fields(secs, ordinal, times)
+
+    # 上卦 = (年支序 + 月数 + 日数) % 8，下卦再加时支序，动爻 % 6（余数为 0 取 8 / 6）
+    year_zhi = year_gz % 12 + 1
+    hour_zhi = hour_zhi_index + 1
+    sum_base = year_zhi + np.abs(lunar_month) + lunar_day
+    upper = (sum_base - 1) % 8 + 1
+    lower = (sum_base + hour_zhi - 1) % 8 + 1
+    moving_line = (sum_base + hour_zhi - 1) % 6 + 1
+
+    ben = (_TRIGRAM_CODES[upper - 1] << 3) | _TRIGRAM_CODES[lower - 1]
+    bian = ben ^ (1 << (moving_line - 1))
+
+    return TimeBatch(
+        times=times, hour=hour,
+        lunar_year=lunar_year, lunar_month=lunar_month, lunar_day=lunar_day,
+        year_gz=year_gz, month_gz=month_gz, day_gz=day_gz, hour_gz=hour_gz,
+        year_zhi=year_zhi, hour_zhi=hour_zhi,
+        upper=upper, lower=lower, moving_line=moving_line,
+        ben=ben, bian=bian,
+    )
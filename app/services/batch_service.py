@@ -0,0 +1,109 @@
+# app/services/batch_service.py
+"""
+批量排盘
+
+一批请求先按起卦参数去重，每组相同参数只计算一次；
+去重后的数量达到阈值时分发到进程池并行计算，结果按原顺序返回，单项出错不影响其他项。
+进程池在第一次需要时由请求线程创建，此时日志、排盘线程池、排盘记录等后台线程早已运行，
+fork 出的子进程可能继承被这些线程持有的锁而死锁，因此用 forkserver（不支持时用 spawn）启动子进程。
+  LIUYAO_BATCH_MAX_SIZE             单批最多条目数（默认 1000）
+  LIUYAO_BATCH_WORKERS              进程池大小（默认 CPU 核数）
+  LIUYAO_BATCH_PARALLEL_THRESHOLD   去重后达到多少条才使用进程池（默认 200）
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from .enhanced_divination_service import DivinationInputError, compute_divination, dumps_json
+
+BATCH_MAX_SIZE = int(os.getenv("LIUYAO_BATCH_MAX_SIZE", "1000"))
+BATCH_WORKERS = int(os.getenv("LIUYAO_BATCH_WORKERS", str(os.cpu_count() or 1)))
+BATCH_PARALLEL_THRESHOLD = int(os.getenv("LIUYAO_BATCH_PARALLEL_THRESHOLD", "200"))
+
+# 批量条目：(起卦类型, 时间, 手工爻, 本卦上, 本卦下, 变卦上, 变卦下)，同时作为去重键
+BatchItem = Tuple[str, Optional[datetime], Optional[Tuple[str, ...]],
+                  Optional[str], Optional[str], Optional[str], Optional[str]]
+# 单项结果：(状态码, JSON 字节或错误信息, 成功时的 (本卦编码, 动爻掩码))
+ItemResult = Tuple[int, object, Optional[Tuple[int, int]]]
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def make_item(divination_type: str, target_time: Optional[datetime] = None,
+              manual_yaos: Optional[Sequence[str]] = None,
+              upper_original: Optional[str] = None, lower_original: Optional[str] = None,
+              upper_changed: Optional[str] = None, lower_changed: Optional[str] = None) -> BatchItem:
+    return (divination_type, target_time, tuple(manual_yaos) if manual_yaos else None,
+            upper_original, lower_original, upper_changed, lower_changed)
+
+
+def run_item(item: BatchItem) -> ItemResult:
+    """计算单项，返回 (200, JSON 字节, (本卦, 动爻掩码)) 或 (400/500, 错误信息, None)"""
+    divination_type, target_time, manual_yaos, *names = item
+    try:
+        result = compute_divination(divination_type, target_time,
+                                    list(manual_yaos) if manual_yaos else None, *names)
+        return 200, result.to_json(), (result.chart.ben, result.chart.mask)
+    except DivinationInputError as e:
+        return 400, str(e), None
+    except Exception as e:
+        return 500, str(e), None
+
+
+def _mp_context():
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # forkserver 进程预先导入排盘模块，每个子进程从它 fork 出来即可使用，不必各自重新导入
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS, mp_context=_mp_context())
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def run_batch(items: List[BatchItem]) -> List[ItemResult]:
+    """
+    按原顺序返回每项结果
+    未指定时间的条目统一使用本批次的当前时间，以便去重
+    """
+    now = datetime.now()
+    items = [item if item[1] is not None else (item[0], now) + item[2:] for item in items]
+
+    unique = list(dict.fromkeys(items))
+    if BATCH_WORKERS > 1 and len(unique) >= BATCH_PARALLEL_THRESHOLD:
+        chunksize = max(1, len(unique) // (BATCH_WORKERS * 4))
+        computed = list(_get_pool().map(run_item, unique, chunksize=chunksize))
+    else:
+        computed = [run_item(item) for item in unique]
+
+    by_key = dict(zip(unique, computed))
+    return [by_key[item] for item in items]
+
+
+def render_batch(results: List[ItemResult]) -> bytes:
+    """拼接批量响应：{"results":[{"status":200,"result":{...}},{"status":400,"error":"..."}]}"""
+    parts = []
+    for status, payload, _ in results:
+        if status == 200:
+            parts.append(b'{"status":200,"result":' + payload + b'}')
+        else:
+            parts.append(dumps_json({"status": status, "error": payload}))
+    return b'{"results":[' + b','.join(parts) + b']}'
@@ -1,6 +1,7 @@
 # liuyao/calculator.py
 from typing import Tuple, Dict
 from . import constants  # 使用相对导入
+from .chart import Chart, line_bit
 
 class HexagramCalculator:
     """卦象计算器"""
@@ -41,25 +42,21 @@ class HexagramCalculator:
         """
         return bin(number)[2:].zfill(length)[::-1]
     
+    @staticmethod
+    def calculate_chart(upper_idx: int, lower_idx: int, moving_line: int) -> Chart:
+        """
+        计算本卦编码与动爻掩码.
+        upper_idx, lower_idx 为1-8的卦序.
+        moving_line 为1-6的动爻位置 (从下往上数).
+        变卦为 chart.ben ^ chart.mask, 即动爻处 0->1, 1->0.
+        """
+        return Chart.from_trigrams(upper_idx, lower_idx, line_bit(moving_line))
+    
     @classmethod
     def calculate_changes(cls, upper_idx: int, lower_idx: int, moving_line: int) -> Tuple[str, str]:
         """
         计算本卦和变卦的六爻二进制表示.
-        upper_idx, lower_idx 为1-8的卦序.
-        moving_line 为1-6的动爻位置 (从下往上数).
+        字符串的首位是第6爻(上爻)，末位是第1爻(初爻).
         """
-        # upper_idx-1 和 lower_idx-1 转换为0-7的数字用于二进制表示
-        ben_gua_upper_bin = cls.generate_binary_representation(upper_idx - 1)
-        ben_gua_lower_bin = cls.generate_binary_representation(lower_idx - 1)
-        
-        # 上卦二进制 + 下卦二进制
-        ben_gua = ben_gua_upper_bin + ben_gua_lower_bin
-
-        bian_list = list(ben_gua)
-        # 动爻位置: moving_line 是1-6, 列表索引是0-5.
-        # -moving_line (如动爻1对应列表-1即末位，动爻6对应列表-6即首位)
-        # 这表示您的爻排列中，字符串的首位是第6爻(上爻)，末位是第1爻(初爻).
-        change_index = len(bian_list) - moving_line 
-        bian_list[change_index] = str(1 - int(bian_list[change_index])) # 爻变 0->1, 1->0
-        
-        return ben_gua, "".join(bian_list)
\ No newline at end of file
+        chart = cls.calculate_chart(upper_idx, lower_idx, moving_line)
+        return chart.ben_binary, chart.bian_binary
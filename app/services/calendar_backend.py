@@ -0,0 +1,262 @@
+# app/services/calendar_backend.py
+"""
+可插拔的农历后端
+
+LunarDateTimeConverter 需要的天文历法数据只有两类：
+  - 农历年月日：取决于朔日（每个农历月的初一）
+  - 年柱、月柱：取决于节（立春、惊蛰……小寒）的交接时刻
+两个后端：
+  - lunar_python：逐次计算，作为参照实现（默认）
+  - table：读取预先生成的二进制表（1900-2100），mmap 映射后多进程共享同一份物理内存，
+    查询为对有序时间戳的 bisect；超出表范围时回退到 lunar_python
+
+通过环境变量选择：
+  LIUYAO_CALENDAR_BACKEND = lunar_python | table
+  LIUYAO_CALENDAR_TABLE   = 表文件路径（默认 app/data/calendar_1900_2100.bin）
+
+生成表（在 app 目录下）：python -m services.calendar_backend build [输出路径]
+"""
+import bisect
+import calendar
+import mmap
+import os
+import struct
+import sys
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+
+from lunar_python import Lunar, LunarYear, Solar
+
+from .ganzhi import JIAZI
+
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'calendar_1900_2100.bin')
+
+# 文件头：魔数、起止年份、节的个数、农历月的个数
+_HEADER = struct.Struct('<8sHHII')
+_MAGIC = b'LYCAL001'
+
+
+def _timestamp(dt: datetime) -> int:
+    """按字面时间（忽略时区、舍去微秒）换算的秒数，与 lunar_python 的比较精度一致"""
+    return calendar.timegm(dt.timetuple())
+
+
+def _solar_timestamp(solar: Solar) -> int:
+    return calendar.timegm((solar.getYear(), solar.getMonth(), solar.getDay(),
+                            solar.getHour(), solar.getMinute(), solar.getSecond()))
+
+
+# lunar_python 节气表中的十二节（表的首尾几项以拼音为键，指相邻年份的同名节）
+_JIE_NAMES = frozenset((
+    '小寒', '立春', '惊蛰', '清明', '立夏', '芒种', '小暑', '立秋', '白露', '寒露', '立冬', '大雪',
+    'DA_XUE', 'XIAO_HAN', 'LI_CHUN', 'JING_ZHE',
+))
+
+
+class LunarPythonBackend:
+    """参照实现：按时刻构建 lunar_python 的 Lunar 对象"""
+    name = 'lunar_python'
+
+    def __init__(self):
+        # 同一时刻通常先后查询农历日期、年月柱与节交接，缓存最近一次构建的对象
+        self._last = None
+
+    def _lunar(self, dt: datetime) -> Lunar:
+        # Lunar 只取到秒的字面时间，按此比较，带微秒或时区的同一时刻也能命中
+        dt = dt.replace(microsecond=0, tzinfo=None)
+        last = self._last
+        if last is not None and last[0] == dt:
+            return last[1]
+        lunar = Lunar.fromDate(dt)
+        self._last = (dt, lunar)
+        return lunar
+
+    def lunar_date(self, dt: datetime) -> Tuple[int, int, int]:
+        """农历年、月（闰月为负）、日"""
+        lunar = self._lunar(dt)
+        return lunar.getYear(), lunar.getMonth(), lunar.getDay()
+
+    def year_month_ganzhi(self, dt: datetime) -> Tuple[str, str]:
+        """以节交接时刻为准的年柱、月柱"""
+        lunar = self._lunar(dt)
+        return lunar.getYearInGanZhiExact(), lunar.getMonthInGanZhiExact()
+
+    def jie_within_hour(self, dt: datetime) -> bool:
+        """dt 所在小时内（整点之后）是否有节交接，即年柱、月柱是否在小时内变化"""
+        start = _timestamp(dt.replace(minute=0, second=0))
+        # 直接用已构建的 Lunar 对象中的节气表，不再做农历换算
+        for name, solar in self._lunar(dt).getJieQiTable().items():
+            if name in _JIE_NAMES and start < _solar_timestamp(solar) < start + 3600:
+                return True
+        return False
+
+
+class TableBackend:
+    """
+    查表实现
+    表内容：
+      jie_ts      int64[n_jie]   每个节的交接时刻（秒）
+      jie_year    uint8[n_jie]   该时刻起的年柱甲子序号
+      jie_month   uint8[n_jie]   该时刻起的月柱甲子序号
+      month_start int32[n_mon]   每个农历月初一的 date.toordinal()
+      month_year  int16[n_mon]   农历年
+      month_num   int8[n_mon]    农历月（闰月为负）
+    """
+    name = 'table'
+
+    def __init__(self, path: str = DEFAULT_TABLE_PATH, fallback: Optional[LunarPythonBackend] = None):
+        self.path = path
+        self.fallback = fallback or LunarPythonBackend()
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mmap)
+        magic, self.start_year, self.end_year, n_jie, n_mon = _HEADER.unpack_from(buf)
+        if magic != _MAGIC:
+            raise ValueError(f"不是有效的农历表文件: {path}")
+
+        offset = _HEADER.size
+        self.jie_ts = buf[offset:offset + 8 * n_jie].cast('q')
+        offset += 8 * n_jie
+        self.jie_year = buf[offset:offset + n_jie]
+        offset += n_jie
+        self.jie_month = buf[offset:offset + n_jie]
+        offset += n_jie
+        self.month_start = buf[offset:offset + 4 * n_mon].cast('i')
+        offset += 4 * n_mon
+        self.month_year = buf[offset:offset + 2 * n_mon].cast('h')
+        offset += 2 * n_mon
+        self.month_num = buf[offset:offset + n_mon].cast('b')
+
+        self._min_date = date(self.start_year, 1, 1)
+        self._max_date = date(self.end_year, 12, 31)
+
+    def _in_range(self, dt: datetime) -> bool:
+        return self._min_date <= dt.date() <= self._max_date
+
+    def lunar_date(self, dt: datetime) -> Tuple[int, int, int]:
+        if not self._in_range(dt):
+            return self.fallback.lunar_date(dt)
+        ordinal = dt.toordinal()
+        i = bisect.bisect_right(self.month_start, ordinal) - 1
+        return self.month_year[i], self.month_num[i], ordinal - self.month_start[i] + 1
+
+    def year_month_ganzhi(self, dt: datetime) -> Tuple[str, str]:
+        if not self._in_range(dt):
+            return self.fallback.year_month_ganzhi(dt)
+        i = bisect.bisect_right(self.jie_ts, _timestamp(dt)) - 1
+        return JIAZI[self.jie_year[i]], JIAZI[self.jie_month[i]]
+
+    def jie_within_hour(self, dt: datetime) -> bool:
+        if not self._in_range(dt):
+            return self.fallback.jie_within_hour(dt)
+        start = _timestamp(dt.replace(minute=0, second=0))
+        i = bisect.bisect_right(self.jie_ts, start)
+        return i < len(self.jie_ts) and self.jie_ts[i] < start + 3600
+
+
+def _solar_to_datetime(solar: Solar) -> datetime:
+    return datetime(solar.getYear(), solar.getMonth(), solar.getDay(),
+                    solar.getHour(), solar.getMinute(), solar.getSecond())
+
+
+def build_table(path: str = DEFAULT_TABLE_PATH, start_year: int = 1900, end_year: int = 2100) -> int:
+    """
+    用 lunar_python 生成农历表
+    :return: 写入的字节数
+    """
+    jie_instants = set()
+    months = {}
+    # 前后各多取一年，保证表覆盖 start_year-01-01 之前最近的节与朔日
+    for year in range(start_year - 1, end_year + 2):
+        lunar_year = LunarYear.fromYear(year)
+        # 偶数下标为节（大雪、小寒、立春……），奇数下标为气
+        for jd in lunar_year.getJieQiJulianDays()[::2]:
+            jie_instants.add(_solar_to_datetime(Solar.fromJulianDay(jd)))
+        for month in lunar_year.getMonths():
+            first = Solar.fromJulianDay(month.getFirstJulianDay())
+            ordinal = date(first.getYear(), first.getMonth(), first.getDay()).toordinal()
+            months[ordinal] = (month.getYear(), month.getMonth())
+
+    jie_ts, jie_year, jie_month = [], [], []
+    for instant in sorted(jie_instants):
+        # 交接时刻本身即属于新的节，取该时刻的参照值
+        lunar = Lunar.fromDate(instant)
+        jie_ts.append(_timestamp(instant))
+        jie_year.append(JIAZI.index(lunar.getYearInGanZhiExact()))
+        jie_month.append(JIAZI.index(lunar.getMonthInGanZhiExact()))
+
+    month_start = sorted(months)
+    n_jie, n_mon = len(jie_ts), len(month_start)
+    data = b''.join((
+        _HEADER.pack(_MAGIC, start_year, end_year, n_jie, n_mon),
+        struct.pack(f'<{n_jie}q', *jie_ts),
+        bytes(jie_year),
+        bytes(jie_month),
+        struct.pack(f'<{n_mon}i', *month_start),
+        struct.pack(f'<{n_mon}h', *(months[o][0] for o in month_start)),
+        struct.pack(f'<{n_mon}b', *(months[o][1] for o in month_start)),
+    ))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+def verify_table(backend: TableBackend, step_hours: int = 7) -> int:
+    """
+    与 lunar_python 对比：按 step_hours 步进扫描整个表范围，并检查每个节交接时刻前后一秒
+    :return: 校验过的时刻数，不一致时抛出 AssertionError
+    """
+    reference = LunarPythonBackend()
+    checked = 0
+
+    def check(dt: datetime):
+        assert backend.lunar_date(dt) == reference.lunar_date(dt), (dt, backend.lunar_date(dt))
+        assert backend.year_month_ganzhi(dt) == reference.year_month_ganzhi(dt), (dt, backend.year_month_ganzhi(dt))
+
+    dt = datetime(backend.start_year, 1, 1)
+    end = datetime(backend.end_year, 12, 31, 23, 59, 59)
+    while dt <= end:
+        check(dt)
+        checked += 1
+        dt += timedelta(hours=step_hours)
+
+    for ts in backend.jie_ts:
+        instant = datetime(1970, 1, 1) + timedelta(seconds=ts)
+        if backend.start_year <= instant.year <= backend.end_year:
+            for delta in (-1, 0, 1):
+                check(instant + timedelta(seconds=delta))
+                checked += 1
+    return checked
+
+
+_backend = None
+
+
+def get_calendar_backend():
+    """按环境变量选择并缓存农历后端"""
+    global _backend
+    if _backend is None:
+        choice = os.getenv("LIUYAO_CALENDAR_BACKEND", "lunar_python")
+        if choice == "table":
+            _backend = TableBackend(os.getenv("LIUYAO_CALENDAR_TABLE", DEFAULT_TABLE_PATH))
+        elif choice == "lunar_python":
+            _backend = LunarPythonBackend()
+        else:
+            raise ValueError(f"未知的农历后端: {choice}")
+    return _backend
+
+
+if __name__ == "__main__":
+    # 在 app 目录下运行:
+    #   python -m services.calendar_backend build [输出路径]
+    #   python -m services.calendar_backend verify [表路径]
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+    table_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_TABLE_PATH
+    if command == "build":
+        print(f"已生成 {table_path}（{build_table(table_path)} 字节）")
+    elif command == "verify":
+        print(f"校验通过: {verify_table(TableBackend(table_path))} 个时刻")
+    else:
+        print(f"未知命令: {command}")
+        sys.exit(1)
@@ -0,0 +1,64 @@
+# app/services/chart.py
+"""
+紧凑的卦盘表示
+
+本卦与动爻均以 6 位整数表示，与六爻二进制串 int(yao_binary, 2) 一一对应：
+    第 n 爻（1-6，初爻到上爻）对应 bit (n-1)，0 为阳爻，1 为阴爻
+变卦即 本卦 ^ 动爻掩码，二进制串只在序列化响应时才生成。
+"""
+from typing import List
+
+from . import constants
+
+# 八卦（先天序 1-8）对应的三爻编码，与 HexagramCalculator.generate_binary_representation 一致
+# 乾'000'->0, 兑'100'->4, 离'010'->2, 震'110'->6, 巽'001'->1, 坎'101'->5, 艮'011'->3, 坤'111'->7
+TRIGRAM_CODES = [int(format(i, '03b')[::-1], 2) for i in range(8)]
+
+# 八卦名 -> 三爻编码
+TRIGRAM_NAME_TO_CODE = {name: TRIGRAM_CODES[i] for i, name in enumerate(constants.HEXAGRAM_NAMES)}
+
+
+def line_bit(position: int) -> int:
+    """爻位（1-6）对应的位掩码"""
+    return 1 << (position - 1)
+
+
+class Chart:
+    """本卦 + 动爻掩码"""
+    __slots__ = ('ben', 'mask')
+
+    def __init__(self, ben: int, mask: int = 0):
+        self.ben = ben
+        self.mask = mask
+
+    @classmethod
+    def from_trigrams(cls, upper_idx: int, lower_idx: int, mask: int = 0) -> 'Chart':
+        """由上下卦卦序（1-8）构建"""
+        return cls((TRIGRAM_CODES[upper_idx - 1] << 3) | TRIGRAM_CODES[lower_idx - 1], mask)
+
+    @property
+    def bian(self) -> int:
+        """变卦编码"""
+        return self.ben ^ self.mask
+
+    @property
+    def moving_lines(self) -> List[int]:
+        """动爻位置列表（1-6，从初爻到上爻）"""
+        return [pos for pos in range(1, 7) if self.mask & line_bit(pos)]
+
+    @property
+    def ben_binary(self) -> str:
+        return format(self.ben, '06b')
+
+    @property
+    def bian_binary(self) -> str:
+        return format(self.bian, '06b')
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Chart) and self.ben == other.ben and self.mask == other.mask
+
+    def __hash__(self) -> int:
+        return (self.ben << 6) | self.mask
+
+    def __repr__(self) -> str:
+        return f"Chart(ben={self.ben_binary}, mask={format(self.mask, '06b')})"
@@ -24,6 +24,16 @@ HEXAGRAM_ELEMENTS = {
     '巽': '风', '坎': '水', '艮': '山', '坤': '地'
 }
 
+# 八宫五行（六亲以宫五行为"我"）
+GONG_WUXING = {
+    '乾宫': '金', '兑宫': '金', '离宫': '火', '震宫': '木',
+    '巽宫': '木', '坎宫': '水', '艮宫': '土', '坤宫': '土'
+}
+
+# 五行相生（我生）、相克（我克）
+WUXING_SHENG = {'木': '火', '火': '土', '土': '金', '金': '水', '水': '木'}
+WUXING_KE = {'木': '土', '土': '水', '水': '火', '火': '金', '金': '木'}
+
 # 六十四卦全名
 GUA_64 = {
     # 乾宫八卦 
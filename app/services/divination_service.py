@@ -4,6 +4,8 @@ from typing import Dict, Any, Tuple, List
 
 from . import constants
 from .time_converter import LunarDateTimeConverter
+from .chart import Chart, line_bit
+from .hexagram_table import HEXAGRAM_TABLE
 
 # --- 从 calculator.py 移植过来的核心计算逻辑 ---
 class HexagramCalculator:
@@ -32,15 +34,15 @@ class HexagramCalculator:
         # 巽(5->num 4)->'001', 坎(6->num 5)->'101', 艮(7->num 6)->'011', 坤(8->num 7)->'111'
         return bin(number)[2:].zfill(length)[::-1]
     
+    @staticmethod
+    def calculate_chart(upper_idx: int, lower_idx: int, moving_line: int) -> Chart:
+        # 本卦编码 + 动爻掩码，变卦为 ben ^ mask
+        return Chart.from_trigrams(upper_idx, lower_idx, line_bit(moving_line))
+    
     @classmethod
     def calculate_changes(cls, upper_idx: int, lower_idx: int, moving_line: int) -> Tuple[str, str]:
-        ben_gua_upper_bin = cls.generate_binary_representation(upper_idx - 1)
-        ben_gua_lower_bin = cls.generate_binary_representation(lower_idx - 1)
-        ben_gua = ben_gua_upper_bin + ben_gua_lower_bin
-        bian_list = list(ben_gua)
-        change_index = len(bian_list) - moving_line
-        bian_list[change_index] = str(1 - int(bian_list[change_index]))
-        return ben_gua, "".join(bian_list)
+        chart = cls.calculate_chart(upper_idx, lower_idx, moving_line)
+        return chart.ben_binary, chart.bian_binary
 
 # --- 新增的辅助函数 ---
 def calculate_liushen(day_tiangan: str) -> List[str]:
@@ -59,40 +61,22 @@ def calculate_liushen(day_tiangan: str) -> List[str]:
     
     return liushen_sequence
 
-def _get_hexagram_details_from_binary(binary_str: str, day_tiangan: str = None) -> Dict[str, Any]:
-    """根据六爻二进制串，反查卦名、上下卦、六爻信息"""
-    
-    # 建立二进制 -> 卦名 的反向查找表
-    TRIGRAM_BINARY_MAP = {
-        HexagramCalculator.generate_binary_representation(i): name 
-        for i, name in enumerate(constants.HEXAGRAM_NAMES)
-    }
-
-    upper_bin = binary_str[:3]
-    lower_bin = binary_str[3:]
-
-    upper_name = TRIGRAM_BINARY_MAP.get(upper_bin, "未知")
-    lower_name = TRIGRAM_BINARY_MAP.get(lower_bin, "未知")
+def _get_hexagram_details(code: int, day_tiangan: str = None) -> Dict[str, Any]:
+    """根据六爻编码，查预计算表得到卦名、上下卦、六爻信息"""
+    entry = HEXAGRAM_TABLE[code]
 
-    full_name_key = f"{upper_name}{lower_name}"
-    full_name = constants.GUA_64.get(full_name_key, f"未知卦 ({full_name_key})")
-    
-    base_name_for_liuyao = full_name.split('（')[0]
-    liuyao_info = constants.GUA_LIUYAO.get(base_name_for_liuyao, {}).get('yao_info', [])
-    gong = constants.GUA_LIUYAO.get(base_name_for_liuyao, {}).get('gong', '未知宫')
-    
     # 计算六神（如果提供了日干）
     liushen_list = []
     if day_tiangan:
         liushen_list = calculate_liushen(day_tiangan)
 
     return {
-        "name": full_name,
-        "upper_trigram": upper_name,
-        "lower_trigram": lower_name,
-        "yao_binary": binary_str,
-        "gong": gong,
-        "liuyao": liuyao_info,
+        "name": entry.name,
+        "upper_trigram": entry.upper_trigram,
+        "lower_trigram": entry.lower_trigram,
+        "yao_binary": entry.yao_binary,
+        "gong": entry.gong,
+        "liuyao": entry.liuyao,
         "liushen": liushen_list,
     }
 
@@ -118,14 +102,14 @@ def perform_divination(target_time: datetime = None) -> Dict[str, Any]:
     }
     
     upper_idx, lower_idx, moving_line = HexagramCalculator.calculate_hexagram_indices(calculation_params)
-    ben_gua_bin, bian_gua_bin = HexagramCalculator.calculate_changes(upper_idx, lower_idx, moving_line)
+    chart = HexagramCalculator.calculate_chart(upper_idx, lower_idx, moving_line)
     
     # 获取日干用于计算六神
     day_tiangan = ganzhi_info['day_gz'][0]
     
     # 使用辅助函数获取本卦和变卦的完整信息
-    ben_gua_details = _get_hexagram_details_from_binary(ben_gua_bin, day_tiangan)
-    bian_gua_details = _get_hexagram_details_from_binary(bian_gua_bin, day_tiangan)
+    ben_gua_details = _get_hexagram_details(chart.ben, day_tiangan)
+    bian_gua_details = _get_hexagram_details(chart.bian, day_tiangan)
 
     result = {
         "query_time": {
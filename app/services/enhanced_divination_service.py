@@ -1,215 +1,424 @@
 # app/services/enhanced_divination_service.py
-from datetime import datetime
-from typing import Dict, Any, List, Optional, Tuple
+import json
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, Any, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
 from . import constants
 from .time_converter import LunarDateTimeConverter
+from .calendar_backend import get_calendar_backend
+from .result_cache import RESULT_CACHE
+from .metrics import CALENDAR_STAGE, HEXAGRAM_STAGE, SERIALIZE_STAGE
+from .batch_engine import TimeBatch, compute_time_batch
+from .ganzhi import JIAZI
+from .time_calendar import TimeRecord, get_time_calendar, lunar_year_of
 from .divination_service import HexagramCalculator, calculate_liushen
+from .chart import Chart, TRIGRAM_NAME_TO_CODE, line_bit
+from .hexagram_table import GONG_ROWS, HEXAGRAM_TABLE, HexagramEntry, YaoRow, lookup_transition, parse_yao_details  # parse_yao_details 已迁至 hexagram_table，保留原导入路径
 
-def parse_yao_details(yao_info: Dict[str, str]) -> Dict[str, str]:
-    """
-    解析爻位信息，分离纳甲、六亲、世应等信息
-    :param yao_info: 原始爻位信息，如 {'name': '父母戌土 世'}
-    :return: 解析后的详细信息
-    """
-    name = yao_info.get('name', '')
-    
-    # 分离世应标记
-    shi_ying = ''
-    if name.endswith(' 世'):
-        shi_ying = '世'
-        name = name[:-2].strip()
-    elif name.endswith(' 应'):
-        shi_ying = '应'
-        name = name[:-2].strip()
+def _hexagram_block(entry: HexagramEntry, yaos: Tuple[YaoRow, ...], liushen_list: List[str]) -> Dict[str, Any]:
+    """由预计算的卦信息与六爻纳甲构建响应中的卦象字典"""
+    binary_str = entry.yao_binary
     
-    # 解析纳甲六亲信息（格式：六亲+纳甲）
-    # 例如：父母戌土 -> 六亲：父母，纳甲：戌土
-    liuqin = ''
-    najia = ''
-    
-    if name:
-        # 常见六亲：父母、兄弟、子孙、妻财、官鬼
-        liuqin_patterns = ['父母', '兄弟', '子孙', '妻财', '官鬼']
-        for pattern in liuqin_patterns:
-            if name.startswith(pattern):
-                liuqin = pattern
-                najia = name[len(pattern):].strip()
-                break
+    # 构建详细的六爻信息
+    detailed_yaos = []
+    for i, yao in enumerate(yaos):
+        yao_binary = binary_str[5-i]  # 二进制串是从上爻到初爻
         
-        if not liuqin:
-            # 如果没有匹配到标准六亲，整个作为纳甲
-            najia = name
-    
+        detailed_yaos.append({
+            'position': i + 1,  # 爻位：1-6（初爻到上爻）
+            'binary': yao_binary,
+            'type': "阳爻" if yao_binary == "0" else "阴爻",
+            'liuqin': yao.liuqin,
+            'najia': yao.najia,
+            'liushen': liushen_list[i] if liushen_list else "",
+            'shi_ying': yao.shi_ying
+        })
+
     return {
-        'liuqin': liuqin,
-        'najia': najia,
-        'shi_ying': shi_ying
+        "name": entry.name,
+        "upper_trigram": entry.upper_trigram,
+        "lower_trigram": entry.lower_trigram,
+        "yao_binary": binary_str,
+        "gong": entry.gong,
+        "yaos": detailed_yaos
     }
 
-def get_enhanced_hexagram_details(binary_str: str, day_tiangan: str = None) -> Dict[str, Any]:
+def get_enhanced_hexagram_details(code: int, day_tiangan: str = None) -> Dict[str, Any]:
     """
     获取增强的卦象详情，包含完整的六爻盘信息
+    卦名、宫位及纳甲六亲世应均来自预计算的六十四卦表，六亲按本卦自身宫位起
+    :param code: 六爻编码（见 chart.Chart）
     """
-    # 建立二进制 -> 卦名 的反向查找表
-    TRIGRAM_BINARY_MAP = {
-        HexagramCalculator.generate_binary_representation(i): name 
-        for i, name in enumerate(constants.HEXAGRAM_NAMES)
-    }
-
-    upper_bin = binary_str[:3]
-    lower_bin = binary_str[3:]
-
-    upper_name = TRIGRAM_BINARY_MAP.get(upper_bin, "未知")
-    lower_name = TRIGRAM_BINARY_MAP.get(lower_bin, "未知")
-
-    full_name_key = f"{upper_name}{lower_name}"
-    full_name = constants.GUA_64.get(full_name_key, f"未知卦 ({full_name_key})")
-    
-    base_name_for_liuyao = full_name.split('（')[0]
-    gua_info = constants.GUA_LIUYAO.get(base_name_for_liuyao, {})
-    liuyao_info = gua_info.get('yao_info', [])
-    gong = gua_info.get('gong', '未知宫')
+    entry = HEXAGRAM_TABLE[code]
     
     # 计算六神（如果提供了日干）
     liushen_list = []
     if day_tiangan:
         liushen_list = calculate_liushen(day_tiangan)
     
-    # 构建详细的六爻信息
-    detailed_yaos = []
-    for i in range(6):
-        yao_position = i + 1  # 爻位：1-6（初爻到上爻）
-        yao_binary = binary_str[5-i]  # 二进制串是从上爻到初爻
-        yao_type = "阳爻" if yao_binary == "0" else "阴爻"
-        
-        # 纳甲六亲信息
-        yao_details = {}
-        if i < len(liuyao_info):
-            yao_details = parse_yao_details(liuyao_info[i])
-        
-        # 六神信息
-        liushen = ""
-        if i < len(liushen_list):
-            liushen = liushen_list[i]
-        
-        detailed_yaos.append({
-            'position': yao_position,
-            'binary': yao_binary,
-            'type': yao_type,
-            'liuqin': yao_details.get('liuqin', ''),
-            'najia': yao_details.get('najia', ''),
-            'liushen': liushen,
-            'shi_ying': yao_details.get('shi_ying', '')
-        })
+    return _hexagram_block(entry, entry.yaos, liushen_list)
 
-    return {
-        "name": full_name,
-        "upper_trigram": upper_name,
-        "lower_trigram": lower_name,
-        "yao_binary": binary_str,
-        "gong": gong,
-        "yaos": detailed_yaos
-    }
+def manual_yaos_to_chart(manual_yaos: List[str]) -> Chart:
+    """
+    将手工爻选择（从初爻到上爻）转换为卦盘
+    :param manual_yaos: 六个爻的选择，如 ['阳爻', '阴爻动', '阳爻', '阴爻', '阳爻动', '阴爻']
+    """
+    ben = 0
+    mask = 0
+    for i, yao_choice in enumerate(manual_yaos):
+        bit = 1 << i
+        if "阳爻" not in yao_choice:
+            ben |= bit  # 阴爻
+        if "动" in yao_choice:
+            mask |= bit  # 动爻
+    return Chart(ben, mask)
 
-def perform_time_divination(target_time: datetime = None) -> Dict[str, Any]:
+def names_to_chart(upper_original: str, lower_original: str,
+                   upper_changed: str, lower_changed: str) -> Chart:
+    """由本卦、变卦的上下卦名构建卦盘，未知卦名按乾处理"""
+    ben = (TRIGRAM_NAME_TO_CODE.get(upper_original, 0) << 3) | TRIGRAM_NAME_TO_CODE.get(lower_original, 0)
+    bian = (TRIGRAM_NAME_TO_CODE.get(upper_changed, 0) << 3) | TRIGRAM_NAME_TO_CODE.get(lower_changed, 0)
+    return Chart(ben, ben ^ bian)
+
+def dumps_json(obj: Any) -> bytes:
+    """与 FastAPI 默认 JSONResponse 相同的编码方式"""
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+@lru_cache(maxsize=None)
+def _original_fragment(code: int, day_tiangan: str) -> bytes:
+    """本卦的 JSON 片段，只取决于（卦, 日干）"""
+    entry = HEXAGRAM_TABLE[code]
+    return dumps_json(_hexagram_block(entry, entry.yaos, calculate_liushen(day_tiangan)))
+
+@lru_cache(maxsize=None)
+def _changed_fragment(gong: str, code: int, day_tiangan: str) -> bytes:
+    """变卦的 JSON 片段，六亲随本卦宫，因此取决于（本卦宫, 变卦, 日干）"""
+    return dumps_json(_hexagram_block(HEXAGRAM_TABLE[code], GONG_ROWS[(gong, code)], calculate_liushen(day_tiangan)))
+
+class DivinationResult:
     """
-    执行时间起卦
+    一次排盘的结果
+    只保存卦盘与时间信息，序列化（字典或 JSON 字节）推迟到响应时进行
     """
-    if target_time is None:
-        target_time = datetime.now()
+    __slots__ = ('divination_type', 'target_time', 'basic_info', 'ganzhi_info', 'chart', 'moving')
 
-    converter = LunarDateTimeConverter(target_time)
-    basic_info = converter.get_basic_info()
-    ganzhi_info = converter.get_ganzhi_info()
-    
-    calculation_params = {
-        'dizhi_year': HexagramCalculator.get_dizhi_number(ganzhi_info['year_gz'][1]),
-        'month': abs(basic_info['month']),
-        'day': basic_info['day'],
-        'dizhi_hour': HexagramCalculator.get_dizhi_number(ganzhi_info['hour_gz'][1])
-    }
-    
-    upper_idx, lower_idx, moving_line = HexagramCalculator.calculate_hexagram_indices(calculation_params)
-    ben_gua_bin, bian_gua_bin = HexagramCalculator.calculate_changes(upper_idx, lower_idx, moving_line)
-    
-    # 获取日干用于计算六神
-    day_tiangan = ganzhi_info['day_gz'][0]
-    
-    # 获取增强的卦象详情
-    ben_gua_details = get_enhanced_hexagram_details(ben_gua_bin, day_tiangan)
-    bian_gua_details = get_enhanced_hexagram_details(bian_gua_bin, day_tiangan)
+    def __init__(self, divination_type: str, target_time: datetime, basic_info: Dict, ganzhi_info: Dict,
+                 chart: Chart, moving: Dict[str, Any]):
+        self.divination_type = divination_type
+        self.target_time = target_time
+        self.basic_info = basic_info
+        self.ganzhi_info = ganzhi_info
+        self.chart = chart
+        self.moving = moving  # {"moving_line": n} 或 {"moving_lines": [...]}
 
-    return {
-        "divination_type": "时间起卦",
-        "query_time": {
-            "formatted_time": target_time.strftime('%Y-%m-%d %H:%M:%S'),
+    @property
+    def day_tiangan(self) -> str:
+        return self.ganzhi_info['day_gz'][0]
+
+    def with_time(self, target_time: datetime) -> 'DivinationResult':
+        """同一小时内的缓存结果只需替换查询时间"""
+        return DivinationResult(self.divination_type, target_time, self.basic_info, self.ganzhi_info,
+                                self.chart, self.moving)
+
+    def query_time(self) -> Dict[str, Any]:
+        basic_info = self.basic_info
+        return {
+            "formatted_time": self.target_time.strftime('%Y-%m-%d %H:%M:%S'),
             "lunar_date": f"{basic_info['year']}年{basic_info['month']}月{basic_info['day']}日 {basic_info['hour']}时",
-            "ganzhi_info": ganzhi_info
-        },
-        "hexagram": {
-            "original": ben_gua_details,
-            "changed": bian_gua_details,
-            "moving_line": moving_line
+            "ganzhi_info": dict(self.ganzhi_info)
         }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """序列化为响应字典"""
+        # 获取日干用于计算六神
+        liushen_list = calculate_liushen(self.day_tiangan)
+
+        # 变卦六亲以本卦宫五行为准，已在转换表中预先算好
+        transition = lookup_transition(self.chart.ben, self.chart.mask)
+        hexagram = {
+            "original": _hexagram_block(transition.original, transition.original.yaos, liushen_list),
+            "changed": _hexagram_block(transition.changed, transition.changed_yaos, liushen_list),
+        }
+        for key, value in self.moving.items():
+            # 结果可能被缓存共享，列表需复制后再交给调用方
+            hexagram[key] = list(value) if isinstance(value, list) else value
+
+        return {
+            "divination_type": self.divination_type,
+            "query_time": self.query_time(),
+            "hexagram": hexagram
+        }
+
+    def to_json(self) -> bytes:
+        """
+        序列化为 UTF-8 JSON 字节，与 EnhancedDivinationResponse 经 FastAPI 编码的结果一致
+        本卦、变卦部分直接拼接缓存好的片段
+        """
+        chart = self.chart
+        day_tiangan = self.day_tiangan
+        started = time.perf_counter()
+        original = HEXAGRAM_TABLE[chart.ben]
+        original_fragment = _original_fragment(chart.ben, day_tiangan)
+        changed_fragment = _changed_fragment(original.gong, chart.bian, day_tiangan)
+        looked_up = time.perf_counter()
+        HEXAGRAM_STAGE.observe(looked_up - started)
+
+        moving = dumps_json(self.moving)[1:-1]  # 去掉外层花括号，拼入 hexagram 对象
+        body = b"".join((
+            b'{"divination_type":', dumps_json(self.divination_type),
+            b',"query_time":', dumps_json(self.query_time()),
+            b',"hexagram":{"original":', original_fragment,
+            b',"changed":', changed_fragment,
+            b',', moving, b'}}',
+        ))
+        SERIALIZE_STAGE.observe(time.perf_counter() - looked_up)
+        return body
+
+def _time_result(batch: TimeBatch, i: int, target_time: datetime) -> DivinationResult:
+    """由批量结果的第 i 行构建时间起卦结果"""
+    basic_info = {
+        'year': int(batch.lunar_year[i]),
+        'month': int(batch.lunar_month[i]),
+        'day': int(batch.lunar_day[i]),
+        'hour': target_time.hour,
+        'minute': target_time.minute
+    }
+    ganzhi_info = {
+        'year_gz': JIAZI[batch.year_gz[i]],
+        'month_gz': JIAZI[batch.month_gz[i]],
+        'day_gz': JIAZI[batch.day_gz[i]],
+        'hour_gz': JIAZI[batch.hour_gz[i]]
     }
+    ben = int(batch.ben[i])
+    chart = Chart(ben, ben ^ int(batch.bian[i]))
+    return DivinationResult("时间起卦", target_time, basic_info, ganzhi_info, chart,
+                            {"moving_line": int(batch.moving_line[i])})
 
-def perform_manual_divination(manual_yaos: List[str], target_time: datetime = None) -> Dict[str, Any]:
+def _record_result(record: TimeRecord, target_time: datetime) -> DivinationResult:
+    """由预计算日历的记录构建时间起卦结果"""
+    ben, moving_line, year_gz, month_gz, day_gz, hour_gz, lunar_month, lunar_day = record
+    basic_info = {
+        'year': lunar_year_of(target_time, lunar_month),
+        'month': lunar_month,
+        'day': lunar_day,
+        'hour': target_time.hour,
+        'minute': target_time.minute
+    }
+    ganzhi_info = {
+        'year_gz': JIAZI[year_gz],
+        'month_gz': JIAZI[month_gz],
+        'day_gz': JIAZI[day_gz],
+        'hour_gz': JIAZI[hour_gz]
+    }
+    return DivinationResult("时间起卦", target_time, basic_info, ganzhi_info,
+                            Chart(ben, line_bit(moving_line)), {"moving_line": moving_line})
+
+def _compute_time_divination(target_time: datetime) -> DivinationResult:
+    # 时间起卦的卦象由农历日期直接算出，整体计入农历换算阶段
+    with CALENDAR_STAGE.time():
+        # 优先查预计算日历（O(1)），范围外或小时内有节交接时实时计算
+        calendar = get_time_calendar()
+        record = calendar.lookup(target_time) if calendar is not None else None
+        if record is not None:
+            return _record_result(record, target_time)
+        # 实时计算经由批量引擎，保证两条路径结果一致
+        return _time_result(compute_time_batch([target_time]), 0, target_time)
+
+def compute_time_divination_batch(times: Sequence[datetime]) -> List[DivinationResult]:
     """
-    执行手工指定起卦
-    :param manual_yaos: 六个爻的选择，如 ['阳爻', '阴爻动', '阳爻', '阴爻', '阳爻动', '阴爻']
+    批量时间起卦（不经过结果缓存）
+    :param times: datetime 序列或 datetime64 数组
     """
+    batch = compute_time_batch(times)
+    if isinstance(times, np.ndarray):
+        times = batch.times.astype(datetime)
+    return [_time_result(batch, i, target_time) for i, target_time in enumerate(times)]
+
+def _compute_manual_divination(manual_yaos: List[str], target_time: datetime) -> DivinationResult:
+    # 获取时间信息用于四柱
+    with CALENDAR_STAGE.time():
+        converter = LunarDateTimeConverter(target_time)
+        basic_info = converter.get_basic_info()
+        ganzhi_info = converter.get_ganzhi_info()
+
+    with HEXAGRAM_STAGE.time():
+        chart = manual_yaos_to_chart(manual_yaos)
+
+    return DivinationResult("手工指定", target_time, basic_info, ganzhi_info, chart,
+                            {"moving_lines": chart.moving_lines})
+
+def _compute_name_divination(upper_original: str, lower_original: str,
+                             upper_changed: str, lower_changed: str,
+                             target_time: datetime) -> DivinationResult:
+    # 获取时间信息用于四柱
+    with CALENDAR_STAGE.time():
+        converter = LunarDateTimeConverter(target_time)
+        basic_info = converter.get_basic_info()
+        ganzhi_info = converter.get_ganzhi_info()
+
+    with HEXAGRAM_STAGE.time():
+        chart = names_to_chart(upper_original, lower_original, upper_changed, lower_changed)
+
+    # 卦名起卦的动爻沿用从上爻到初爻的顺序
+    return DivinationResult("卦名起卦", target_time, basic_info, ganzhi_info, chart,
+                            {"moving_lines": chart.moving_lines[::-1]})
+
+def iter_time_divination_range(start: datetime, end: datetime, step: timedelta,
+                               chunk_size: int = 256) -> Iterator[DivinationResult]:
+    """
+    逐个产出 [start, end] 内每隔 step 的时间起卦结果
+    按 chunk_size 分块交给批量引擎，农历换算在块内向量化完成，内存占用与区间长度无关
+    """
+    count = (end - start) // step + 1 if end >= start else 0
+    for offset in range(0, count, chunk_size):
+        times = [start + step * i for i in range(offset, min(count, offset + chunk_size))]
+        yield from compute_time_divination_batch(times)
+
+def _calendar_stable_within_hour(target_time: datetime) -> bool:
+    """
+    该小时内年柱、月柱是否不变
+    节的交接时刻可能落在小时中间，这样的小时不能整体缓存
+    """
+    # 预计算日历只为不含节交接的小时保存记录，查到即说明稳定
+    calendar = get_time_calendar()
+    if calendar is not None and calendar.lookup(target_time) is not None:
+        return True
+    # 否则看起卦时农历后端已查过的节交接时刻（table 为一次 bisect，lunar_python 复用刚构建的 Lunar 对象）
+    return not get_calendar_backend().jie_within_hour(target_time)
+
+class DivinationJob(NamedTuple):
+    """
+    一次起卦的缓存键与计算过程
+    按（起卦参数, 日期, 小时）缓存结果：同一小时内农历日期、四柱、卦象都不变
+    （lunar_date 中含钟点，故以小时而非时辰为粒度），命中时只替换查询时间
+    """
+    key: Tuple
+    target_time: datetime
+    compute: Callable[[], DivinationResult]
+
+    def cached(self) -> Optional[DivinationResult]:
+        """只查缓存（计入命中统计），未命中返回 None"""
+        cached = RESULT_CACHE.get(self.key)
+        if cached is None:
+            return None
+        return cached.with_time(self.target_time)
+
+    def run(self) -> DivinationResult:
+        """计算并写入缓存（不再查缓存），含节交接时刻的小时不缓存"""
+        result = self.compute()
+        if RESULT_CACHE.maxsize > 0 and _calendar_stable_within_hour(self.target_time):
+            RESULT_CACHE.put(self.key, result)
+        return result
+
+    def __call__(self) -> DivinationResult:
+        cached = self.cached()
+        return cached if cached is not None else self.run()
+
+def prewarm_time_divination(target_time: datetime) -> bool:
+    """
+    预先计算 target_time 所在小时的时间起卦结果并写入缓存（不计入命中统计）
+    :return: 是否写入了缓存（含节交接时刻的小时不缓存）
+    """
+    if RESULT_CACHE.maxsize <= 0 or not _calendar_stable_within_hour(target_time):
+        return False
+    key = ("time", target_time.date(), target_time.hour)
+    RESULT_CACHE.put(key, _compute_time_divination(target_time))
+    return True
+
+def time_divination_job(target_time: datetime = None) -> DivinationJob:
     if target_time is None:
         target_time = datetime.now()
-    
-    # 获取时间信息用于四柱
-    converter = LunarDateTimeConverter(target_time)
-    basic_info = converter.get_basic_info()
-    ganzhi_info = converter.get_ganzhi_info()
-    day_tiangan = ganzhi_info['day_gz'][0]
-    
-    # 转换手工爻选择为二进制和动爻
-    ben_gua_bits = []
-    moving_lines = []
-    
-    for i, yao_choice in enumerate(manual_yaos):
-        if "阳爻" in yao_choice:
-            ben_gua_bits.append('0')  # 阳爻
-        else:
-            ben_gua_bits.append('1')  # 阴爻
-        
-        if "动" in yao_choice:
-            moving_lines.append(i + 1)  # 记录动爻位置（1-6）
-    
-    # 组合为上→下顺序的二进制串
-    ben_gua_binary = ''.join(reversed(ben_gua_bits))
-    
-    # 计算变卦
-    if not moving_lines:
-        bian_gua_binary = ben_gua_binary
-    else:
-        bian_gua_bits = list(ben_gua_binary)
-        for ml in moving_lines:
-            idx = 6 - ml  # 转换为二进制串中的索引
-            bian_gua_bits[idx] = str(1 - int(bian_gua_bits[idx]))
-        bian_gua_binary = ''.join(bian_gua_bits)
-    
-    # 获取增强的卦象详情
-    ben_gua_details = get_enhanced_hexagram_details(ben_gua_binary, day_tiangan)
-    bian_gua_details = get_enhanced_hexagram_details(bian_gua_binary, day_tiangan)
+    key = ("time", target_time.date(), target_time.hour)
+    return DivinationJob(key, target_time, lambda: _compute_time_divination(target_time))
 
-    return {
-        "divination_type": "手工指定",
-        "query_time": {
-            "formatted_time": target_time.strftime('%Y-%m-%d %H:%M:%S'),
-            "lunar_date": f"{basic_info['year']}年{basic_info['month']}月{basic_info['day']}日 {basic_info['hour']}时",
-            "ganzhi_info": ganzhi_info
-        },
-        "hexagram": {
-            "original": ben_gua_details,
-            "changed": bian_gua_details,
-            "moving_lines": moving_lines
-        }
-    }
+def manual_divination_job(manual_yaos: List[str], target_time: datetime = None) -> DivinationJob:
+    if target_time is None:
+        target_time = datetime.now()
+    key = ("manual", target_time.date(), target_time.hour, tuple(manual_yaos))
+    return DivinationJob(key, target_time, lambda: _compute_manual_divination(manual_yaos, target_time))
+
+def name_divination_job(upper_original: str, lower_original: str,
+                        upper_changed: str, lower_changed: str,
+                        target_time: datetime = None) -> DivinationJob:
+    if target_time is None:
+        target_time = datetime.now()
+    key = ("name", target_time.date(), target_time.hour,
+           upper_original, lower_original, upper_changed, lower_changed)
+    return DivinationJob(key, target_time, lambda: _compute_name_divination(
+        upper_original, lower_original, upper_changed, lower_changed, target_time))
+
+def compute_time_divination(target_time: datetime = None) -> DivinationResult:
+    """
+    执行时间起卦，返回未序列化的结果
+    """
+    return time_divination_job(target_time)()
+
+def compute_manual_divination(manual_yaos: List[str], target_time: datetime = None) -> DivinationResult:
+    """
+    执行手工指定起卦，返回未序列化的结果
+    :param manual_yaos: 六个爻的选择，如 ['阳爻', '阴爻动', '阳爻', '阴爻', '阳爻动', '阴爻']
+    """
+    return manual_divination_job(manual_yaos, target_time)()
+
+def compute_name_divination(upper_original: str, lower_original: str,
+                            upper_changed: str, lower_changed: str,
+                            target_time: datetime = None) -> DivinationResult:
+    """
+    执行卦名起卦，返回未序列化的结果
+    """
+    return name_divination_job(upper_original, lower_original, upper_changed, lower_changed, target_time)()
+
+class DivinationInputError(ValueError):
+    """起卦参数不完整或起卦类型不支持"""
+
+def divination_job(divination_type: str, target_time: datetime = None,
+                   manual_yaos: Optional[List[str]] = None,
+                   upper_original: Optional[str] = None, lower_original: Optional[str] = None,
+                   upper_changed: Optional[str] = None, lower_changed: Optional[str] = None) -> DivinationJob:
+    """
+    按起卦类型分派到三种起卦方式，只校验参数，不做计算
+    :raises DivinationInputError: 参数缺失或起卦类型不支持
+    """
+    if divination_type in ["时间起卦", "time"]:
+        return time_divination_job(target_time)
+    if divination_type in ["手工指定", "manual"]:
+        if not manual_yaos:
+            raise DivinationInputError("手工指定模式需要提供manual_yaos参数")
+        return manual_divination_job(manual_yaos, target_time)
+    if divination_type in ["卦名起卦", "name"]:
+        if not all([upper_original, lower_original, upper_changed, lower_changed]):
+            raise DivinationInputError("卦名起卦模式需要提供所有卦名参数")
+        return name_divination_job(upper_original, lower_original, upper_changed, lower_changed,
+                                   target_time)
+    raise DivinationInputError("不支持的起卦类型")
+
+def compute_divination(divination_type: str, target_time: datetime = None,
+                       manual_yaos: Optional[List[str]] = None,
+                       upper_original: Optional[str] = None, lower_original: Optional[str] = None,
+                       upper_changed: Optional[str] = None, lower_changed: Optional[str] = None) -> DivinationResult:
+    """
+    按起卦类型分派并计算
+    :raises DivinationInputError: 参数缺失或起卦类型不支持
+    """
+    return divination_job(divination_type, target_time, manual_yaos,
+                          upper_original, lower_original, upper_changed, lower_changed)()
+
+def perform_time_divination(target_time: datetime = None) -> Dict[str, Any]:
+    """
+    执行时间起卦
+    """
+    return compute_time_divination(target_time).to_dict()
+
+def perform_manual_divination(manual_yaos: List[str], target_time: datetime = None) -> Dict[str, Any]:
+    """
+    执行手工指定起卦
+    :param manual_yaos: 六个爻的选择，如 ['阳爻', '阴爻动', '阳爻', '阴爻', '阳爻动', '阴爻']
+    """
+    return compute_manual_divination(manual_yaos, target_time).to_dict()
 
 def perform_name_divination(upper_original: str, lower_original: str, 
                           upper_changed: str, lower_changed: str, 
@@ -217,45 +426,5 @@ def perform_name_divination(upper_original: str, lower_original: str,
     """
     执行卦名起卦
     """
-    if target_time is None:
-        target_time = datetime.now()
-    
-    # 获取时间信息用于四柱
-    converter = LunarDateTimeConverter(target_time)
-    basic_info = converter.get_basic_info()
-    ganzhi_info = converter.get_ganzhi_info()
-    day_tiangan = ganzhi_info['day_gz'][0]
-    
-    # 卦名到二进制的映射
-    NAME_TO_BIN = {
-        name: HexagramCalculator.generate_binary_representation(i) 
-        for i, name in enumerate(constants.HEXAGRAM_NAMES)
-    }
-    
-    # 构建本卦和变卦的二进制串
-    ben_gua_binary = NAME_TO_BIN.get(upper_original, '000') + NAME_TO_BIN.get(lower_original, '000')
-    bian_gua_binary = NAME_TO_BIN.get(upper_changed, '000') + NAME_TO_BIN.get(lower_changed, '000')
-    
-    # 计算动爻
-    moving_lines = []
-    for i in range(6):
-        if ben_gua_binary[i] != bian_gua_binary[i]:
-            moving_lines.append(6 - i)  # 转换为爻位（1-6）
-    
-    # 获取增强的卦象详情
-    ben_gua_details = get_enhanced_hexagram_details(ben_gua_binary, day_tiangan)
-    bian_gua_details = get_enhanced_hexagram_details(bian_gua_binary, day_tiangan)
-
-    return {
-        "divination_type": "卦名起卦",
-        "query_time": {
-            "formatted_time": target_time.strftime('%Y-%m-%d %H:%M:%S'),
-            "lunar_date": f"{basic_info['year']}年{basic_info['month']}月{basic_info['day']}日 {basic_info['hour']}时",
-            "ganzhi_info": ganzhi_info
-        },
-        "hexagram": {
-            "original": ben_gua_details,
-            "changed": bian_gua_details,
-            "moving_lines": moving_lines
-        }
-    }
\ No newline at end of file
+    return compute_name_divination(upper_original, lower_original, upper_changed, lower_changed,
+                                   target_time).to_dict()
@@ -0,0 +1,140 @@
+# app/services/executor.py
+"""
+排盘计算的有界线程池
+
+排盘是同步的 CPU 计算，直接在 async 路由中调用会阻塞事件循环。
+这里把计算交给固定大小的线程池，并限制排队深度：
+进行中（执行 + 排队）的任务数达到 workers + queue_depth 时立即拒绝，而不是无限堆积。
+每个任务从提交到开始执行的等待时间计入统计，用于确定线程数。
+  LIUYAO_EXECUTOR_WORKERS   线程数（默认 min(32, CPU 核数 + 4)）
+  LIUYAO_EXECUTOR_QUEUE     最多排队任务数（默认 256）
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from .metrics import EXECUTOR_QUEUE_WAIT, EXECUTOR_QUEUED, EXECUTOR_REJECTED, EXECUTOR_RUNNING
+
+EXECUTOR_WORKERS = int(os.getenv("LIUYAO_EXECUTOR_WORKERS", str(min(32, (os.cpu_count() or 1) + 4))))
+EXECUTOR_QUEUE_DEPTH = int(os.getenv("LIUYAO_EXECUTOR_QUEUE", "256"))
+
+# 计算等待时间分位数时保留的最近样本数
+_WAIT_SAMPLES = 1024
+
+
+class ExecutorBusy(RuntimeError):
+    """线程池与等待队列均已占满"""
+
+
+class BoundedExecutor:
+    """固定线程数、有界排队的线程池"""
+
+    def __init__(self, workers: int = EXECUTOR_WORKERS, queue_depth: int = EXECUTOR_QUEUE_DEPTH):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="liuyao-engine")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recent_waits = deque(maxlen=_WAIT_SAMPLES)
+        # 可选的任务包装，在提交任务的上下文中调用（如按请求剖析），默认不包装
+        self.task_wrapper: Optional[Callable[[Callable], Callable]] = None
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_depth:
+                self.rejected += 1
+                EXECUTOR_REJECTED.inc()
+                raise ExecutorBusy(f"排盘队列已满（{self.workers} 线程，排队上限 {self.queue_depth}）")
+            self._in_flight += 1
+            self._publish()
+
+    def _release(self, future) -> None:
+        # 执行过的任务在 task() 中归还名额，这里只处理未能开始执行（提交失败或被取消）的任务
+        if future is None or future.cancelled():
+            with self._lock:
+                self._in_flight -= 1
+                self._publish()
+
+    def _publish(self) -> None:
+        # 调用方须持有 self._lock
+        EXECUTOR_RUNNING.set(self._running)
+        EXECUTOR_QUEUED.set(self._in_flight - self._running)
+
+    def _wrap(self, fn: Callable, args: tuple, submitted: float) -> Callable[[], Any]:
+        def task():
+            wait = time.perf_counter() - submitted
+            with self._lock:
+                self._running += 1
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+                self._recent_waits.append(wait)
+                self._publish()
+            EXECUTOR_QUEUE_WAIT.observe(wait)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._in_flight -= 1
+                    self.completed += 1
+                    self._publish()
+        return task
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """
+        在线程池中执行 fn(*args) 并等待结果
+        :raises ExecutorBusy: 进行中的任务已达上限
+        """
+        if self.task_wrapper is not None:
+            fn = self.task_wrapper(fn)
+        self._admit()
+        try:
+            # 与 asyncio.to_thread 一样带上调用方的上下文（如日志中的请求 ID）
+            context = contextvars.copy_context()
+            future = self._pool.submit(context.run, self._wrap(fn, args, time.perf_counter()))
+        except BaseException:
+            self._release(None)
+            raise
+        # 名额在任务真正结束时归还；调用方取消等待时任务仍占用线程，不能提前归还
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._recent_waits)
+            started = self.completed + self._running
+
+            def percentile(q: float) -> float:
+                return waits[min(len(waits) - 1, int(q * len(waits)))] * 1000 if waits else 0.0
+
+            return {
+                'workers': self.workers,
+                'queue_depth': self.queue_depth,
+                'running': self._running,
+                'queued': self._in_flight - self._running,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'queue_wait_ms': {
+                    'avg': self._wait_total / started * 1000 if started else 0.0,
+                    'max': self._wait_max * 1000,
+                    'p50': percentile(0.50),
+                    'p95': percentile(0.95),
+                    'p99': percentile(0.99),
+                },
+            }
+
+
+ENGINE_EXECUTOR = BoundedExecutor()
@@ -0,0 +1,80 @@
+# app/services/ganzhi.py
+"""
+日柱、时柱的纯算术计算
+
+日柱只取决于儒略日数：甲子序号 = (JDN - 11) % 60，与 lunar_python 的 getDayInGanZhi 一致；
+时柱由时辰地支和日干推出（五鼠遁），23 点起的夜子时按次日日干起时干，
+与 lunar_python 的 getTimeInGanZhi 一致。
+年柱、月柱依赖节气交接时刻，仍需天文历法数据，不在此模块计算。
+"""
+from datetime import date, datetime, timedelta
+
+from . import constants
+
+# date.toordinal() 与儒略日数 (JDN) 之差
+JDN_OFFSET = 1721425
+
+# 六十甲子，下标为甲子序号 0-59
+JIAZI = [constants.TIANGAN[i % 10] + constants.DIZHI[i % 12] for i in range(60)]
+
+
+def julian_day_number(d: date) -> int:
+    """公历日期的儒略日数"""
+    return d.toordinal() + JDN_OFFSET
+
+
+def day_ganzhi_index(d: date) -> int:
+    """日柱的甲子序号（0-59）"""
+    return (julian_day_number(d) - 11) % 60
+
+
+def hour_zhi_index(hour: int) -> int:
+    """时辰地支序号（0-11，子=0），23 点起为子时"""
+    return (hour + 1) // 2 % 12
+
+
+def hour_ganzhi_index(dt: datetime) -> int:
+    """时柱的甲子序号（0-59）"""
+    zhi = hour_zhi_index(dt.hour)
+    # 夜子时（23 点）按次日日干起时干
+    day_gan = (day_ganzhi_index(dt) + (1 if dt.hour == 23 else 0)) % 10
+    gan = (day_gan % 5 * 2 + zhi) % 10
+    # 由干支序号反求甲子序号：idx ≡ gan (mod 10), idx ≡ zhi (mod 12)
+    return (6 * gan - 5 * zhi) % 60
+
+
+def day_ganzhi(d: date) -> str:
+    """日柱，如 '戊午'"""
+    return JIAZI[day_ganzhi_index(d)]
+
+
+def hour_ganzhi(dt: datetime) -> str:
+    """时柱，如 '壬子'"""
+    return JIAZI[hour_ganzhi_index(dt)]
+
+
+def verify_against_lunar(start_year: int = 1900, end_year: int = 2100) -> int:
+    """
+    与 lunar_python 逐日对比日柱、时柱
+    :return: 校验过的时刻数，不一致时抛出 AssertionError
+    """
+    from lunar_python import Lunar
+
+    checked = 0
+    d = date(start_year, 1, 1)
+    end = date(end_year, 12, 31)
+    while d <= end:
+        # 每天轮流校验一个整点，23 点单独校验夜子时
+        for hour in (d.toordinal() % 24, 23):
+            dt = datetime(d.year, d.month, d.day, hour)
+            lunar = Lunar.fromDate(dt)
+            assert day_ganzhi(dt) == lunar.getDayInGanZhi(), (dt, day_ganzhi(dt), lunar.getDayInGanZhi())
+            assert hour_ganzhi(dt) == lunar.getTimeInGanZhi(), (dt, hour_ganzhi(dt), lunar.getTimeInGanZhi())
+            checked += 1
+        d += timedelta(days=1)
+    return checked
+
+
+if __name__ == "__main__":
+    # 在 app 目录下运行: python -m services.ganzhi
+    print(f"校验通过: {verify_against_lunar()} 个时刻")
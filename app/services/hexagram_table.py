@@ -0,0 +1,221 @@
+# app/services/hexagram_table.py
+"""
+六十四卦预计算表
+
+卦的全部静态信息（卦名、上下卦、所属宫、六冲六合、纳甲六亲世应）只取决于六爻本身，
+因此在模块加载时一次性构建，以六爻二进制串对应的 6 位整数为下标：
+    code = int(yao_binary, 2)   # 首位为上爻，末位为初爻，即第 n 爻对应 bit (n-1)
+查询时只需一次下标访问。
+
+GUA_LIUYAO 中的爻文本（如 '父母戌土 世'）同样在加载时解析为不可变的 YaoRow，
+请求路径上不再做任何字符串解析。
+
+本卦（64）× 动爻掩码（64）共 4096 种组合，TRANSITION_TABLE 预先算好每种组合的
+变卦及其以本卦宫五行重新起出的六亲，排盘时只需一次下标访问再配上六神。
+"""
+import sys
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Tuple
+
+from . import constants
+from .calculator import HexagramCalculator
+
+# 常见六亲：父母、兄弟、子孙、妻财、官鬼
+LIUQIN_PATTERNS = ['父母', '兄弟', '子孙', '妻财', '官鬼']
+
+
+def parse_yao_details(yao_info: Dict[str, str]) -> Dict[str, str]:
+    """
+    解析爻位信息，分离纳甲、六亲、世应等信息
+    :param yao_info: 原始爻位信息，如 {'name': '父母戌土 世'}
+    :return: 解析后的详细信息
+    """
+    name = yao_info.get('name', '')
+
+    # 分离世应标记
+    shi_ying = ''
+    if name.endswith(' 世'):
+        shi_ying = '世'
+        name = name[:-2].strip()
+    elif name.endswith(' 应'):
+        shi_ying = '应'
+        name = name[:-2].strip()
+
+    # 解析纳甲六亲信息（格式：六亲+纳甲）
+    # 例如：父母戌土 -> 六亲：父母，纳甲：戌土
+    liuqin = ''
+    najia = ''
+
+    if name:
+        for pattern in LIUQIN_PATTERNS:
+            if name.startswith(pattern):
+                liuqin = pattern
+                najia = name[len(pattern):].strip()
+                break
+
+        if not liuqin:
+            # 如果没有匹配到标准六亲，整个作为纳甲
+            najia = name
+
+    return {
+        'liuqin': liuqin,
+        'najia': najia,
+        'shi_ying': shi_ying
+    }
+
+
+class YaoRow(NamedTuple):
+    """单爻的纳甲六亲世应（字符串均已 intern）"""
+    liuqin: str     # 六亲，如 '父母'
+    branch: str     # 纳甲地支，如 '戌'
+    element: str    # 纳甲五行，如 '土'
+    najia: str      # 纳甲，如 '戌土'
+    shi_ying: str   # 世应标记（世/应/空）
+
+
+class GuaYaoRows(NamedTuple):
+    """单卦的纳甲信息"""
+    gong: str                   # 所属宫
+    rows: Tuple[YaoRow, ...]    # 六爻，顺序同 GUA_LIUYAO 中的 yao_info
+    shi: int                    # 世爻所在行（1-6），无则为 0
+    ying: int                   # 应爻所在行（1-6），无则为 0
+
+
+def _build_yao_row(yao_info: Dict[str, str]) -> YaoRow:
+    details = parse_yao_details(yao_info)
+    najia = details['najia']
+    return YaoRow(
+        liuqin=sys.intern(details['liuqin']),
+        branch=sys.intern(najia[:1]),
+        element=sys.intern(najia[1:]),
+        najia=sys.intern(najia),
+        shi_ying=sys.intern(details['shi_ying']),
+    )
+
+
+def _build_gua_rows(gua_info: Dict) -> GuaYaoRows:
+    rows = tuple(_build_yao_row(yao) for yao in gua_info['yao_info'])
+    marks = [row.shi_ying for row in rows]
+    return GuaYaoRows(
+        gong=sys.intern(gua_info['gong']),
+        rows=rows,
+        shi=marks.index('世') + 1 if '世' in marks else 0,
+        ying=marks.index('应') + 1 if '应' in marks else 0,
+    )
+
+
+# 卦名（不含六冲六合后缀） -> 解析后的纳甲信息
+YAO_TABLE: Mapping[str, GuaYaoRows] = MappingProxyType({
+    name: _build_gua_rows(gua_info) for name, gua_info in constants.GUA_LIUYAO.items()
+})
+
+
+class HexagramEntry(NamedTuple):
+    """单个卦的静态信息"""
+    name: str                       # 卦全名，如 '乾为天（六冲）'
+    upper_trigram: str              # 上卦
+    lower_trigram: str              # 下卦
+    yao_binary: str                 # 六爻二进制串（上爻→初爻）
+    gong: str                       # 所属宫
+    liuchong: bool                  # 是否六冲卦
+    liuhe: bool                     # 是否六合卦
+    liuyao: List[Dict[str, str]]    # GUA_LIUYAO 中的原始纳甲信息
+    yaos: Tuple[YaoRow, ...]        # 解析后的六亲、纳甲、世应
+    shi: int                        # 世爻所在行（1-6）
+    ying: int                       # 应爻所在行（1-6）
+
+
+# 三爻二进制串 -> 八卦名
+TRIGRAM_BINARY_MAP = {
+    HexagramCalculator.generate_binary_representation(i): name
+    for i, name in enumerate(constants.HEXAGRAM_NAMES)
+}
+
+
+def _build_entry(code: int) -> HexagramEntry:
+    binary_str = format(code, '06b')
+    upper_name = TRIGRAM_BINARY_MAP[binary_str[:3]]
+    lower_name = TRIGRAM_BINARY_MAP[binary_str[3:]]
+
+    full_name = constants.GUA_64[f"{upper_name}{lower_name}"]
+    base_name = full_name.split('（')[0]
+    gua_rows = YAO_TABLE[base_name]
+
+    return HexagramEntry(
+        name=full_name,
+        upper_trigram=upper_name,
+        lower_trigram=lower_name,
+        yao_binary=binary_str,
+        gong=gua_rows.gong,
+        liuchong=full_name.endswith('（六冲）'),
+        liuhe=full_name.endswith('（六合）'),
+        liuyao=constants.GUA_LIUYAO[base_name]['yao_info'],
+        yaos=gua_rows.rows,
+        shi=gua_rows.shi,
+        ying=gua_rows.ying,
+    )
+
+
+HEXAGRAM_TABLE: Tuple[HexagramEntry, ...] = tuple(_build_entry(code) for code in range(64))
+
+
+def lookup_binary(binary_str: str) -> HexagramEntry:
+    """根据六爻二进制串查表"""
+    return HEXAGRAM_TABLE[int(binary_str, 2)]
+
+
+def get_liuqin(gong_element: str, element: str) -> str:
+    """以宫五行为"我"，求某五行对应的六亲"""
+    if element == gong_element:
+        return '兄弟'
+    if constants.WUXING_SHENG[element] == gong_element:
+        return '父母'
+    if constants.WUXING_SHENG[gong_element] == element:
+        return '子孙'
+    if constants.WUXING_KE[element] == gong_element:
+        return '官鬼'
+    return '妻财'
+
+
+class Transition(NamedTuple):
+    """本卦 -> 变卦"""
+    original: HexagramEntry
+    changed: HexagramEntry
+    changed_yaos: Tuple[YaoRow, ...]    # 变卦纳甲，六亲按本卦宫五行起
+
+
+def _rows_under_gong(rows: Tuple[YaoRow, ...], gong: str) -> Tuple[YaoRow, ...]:
+    gong_element = constants.GONG_WUXING[gong]
+    return tuple(row._replace(liuqin=sys.intern(get_liuqin(gong_element, row.element))) for row in rows)
+
+
+# (宫, 卦编码) -> 以该宫五行起六亲的六爻纳甲
+GONG_ROWS: Mapping[Tuple[str, int], Tuple[YaoRow, ...]] = MappingProxyType({
+    (gong, code): _rows_under_gong(HEXAGRAM_TABLE[code].yaos, gong)
+    for gong in constants.GONG_WUXING
+    for code in range(64)
+})
+
+
+def _build_transitions() -> Tuple[Transition, ...]:
+    # 变卦六亲只取决于（本卦宫，变卦），直接引用 GONG_ROWS 中共享的行
+    transitions = []
+    for ben in range(64):
+        original = HEXAGRAM_TABLE[ben]
+        for mask in range(64):
+            bian = ben ^ mask
+            transitions.append(Transition(
+                original=original,
+                changed=HEXAGRAM_TABLE[bian],
+                changed_yaos=GONG_ROWS[(original.gong, bian)],
+            ))
+    return tuple(transitions)
+
+
+# 下标为 (本卦编码 << 6) | 动爻掩码
+TRANSITION_TABLE: Tuple[Transition, ...] = _build_transitions()
+
+
+def lookup_transition(ben: int, mask: int) -> Transition:
+    """根据本卦编码与动爻掩码查变卦"""
+    return TRANSITION_TABLE[(ben << 6) | mask]
@@ -0,0 +1,173 @@
+# app/services/logging_setup.py
+"""
+结构化日志
+
+每条日志输出为一行 JSON（时间、级别、logger、消息、请求 ID 及 extra 中的字段）。
+记录先放入有界队列，由后台线程写出，请求路径上不会因写 stdout 而阻塞；
+队列满时丢弃并计数，而不是等待。
+成功请求的日志量大，可按比例采样：extra 中带 sample=True 的 INFO 及以下记录只保留一部分，
+WARNING 及以上始终保留。
+  LIUYAO_LOG_LEVEL        日志级别（默认 INFO）
+  LIUYAO_LOG_SAMPLE_RATE  可采样记录的保留比例（默认 1，即全部保留）
+  LIUYAO_LOG_QUEUE_SIZE   日志队列长度（默认 10000）
+"""
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from .metrics import LOG_RECORDS_DROPPED
+
+LOG_LEVEL = os.getenv("LIUYAO_LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = float(os.getenv("LIUYAO_LOG_SAMPLE_RATE", "1"))
+LOG_QUEUE_SIZE = int(os.getenv("LIUYAO_LOG_QUEUE_SIZE", "10000"))
+
+# LogRecord 自带的属性，其余属性视为 extra 字段输出
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+_request_fields = contextvars.ContextVar("request_fields", default=None)
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+def bind_request(request_id: str) -> Dict[str, Any]:
+    """
+    为当前请求绑定请求 ID，返回本请求的附加字段字典
+    路由中通过 add_request_fields 写入的字段会出现在该请求的访问日志中
+    """
+    fields = {}
+    _request_id.set(request_id)
+    _request_fields.set(fields)
+    return fields
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def current_request_fields() -> Optional[Dict[str, Any]]:
+    return _request_fields.get()
+
+
+def add_request_fields(**fields: Any) -> None:
+    """向当前请求的访问日志追加字段（不在请求上下文中时忽略）"""
+    current = _request_fields.get()
+    if current is not None:
+        current.update(fields)
+
+
+class RequestContextFilter(logging.Filter):
+    """在产生日志的线程/协程中取出请求 ID；必须挂在 QueueHandler 上，不能放到后台写出线程"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = _request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """按比例丢弃标记为可采样的低级别记录"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sample", False) or record.levelno >= logging.WARNING:
+            return True
+        return self.rate >= 1 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and key != "sample" and value is not None:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+_EXC_FORMATTER = logging.Formatter()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """队列满时丢弃记录并计数"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 只合并消息参数、展开异常堆栈（exc_info 不能跨线程保留），JSON 编码留给后台线程
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.inc()
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[DroppingQueueHandler] = None
+
+
+def setup_logging(level: str = LOG_LEVEL, sample_rate: float = LOG_SAMPLE_RATE,
+                  queue_size: int = LOG_QUEUE_SIZE) -> None:
+    """配置根 logger：JSON 格式，经队列由后台线程写到 stdout（重复调用无副作用）"""
+    global _listener, _handler
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    _handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    _handler.addFilter(RequestContextFilter())
+    _handler.addFilter(SamplingFilter(sample_rate))
+
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """写出队列中剩余的记录并停止后台线程"""
+    global _listener, _handler
+    if _listener is None:
+        return
+    _listener.stop()
+    logging.getLogger().removeHandler(_handler)
+    _listener = None
+    _handler = None
+
+
+def dropped_records() -> int:
+    return _handler.dropped if _handler is not None else 0
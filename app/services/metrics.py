@@ -0,0 +1,102 @@
+# app/services/metrics.py
+"""
+Prometheus 指标
+
+由服务自身在 /metrics 以 Prometheus 文本格式输出，不依赖外部采集代理。
+多进程部署（uvicorn --workers N）时，每个进程各自计数，需设置环境变量
+PROMETHEUS_MULTIPROC_DIR 指向一个所有 worker 共享的空目录（须在进程启动前设置）：
+各进程把指标写入该目录下的 mmap 文件，任一 worker 响应 /metrics 时汇总全部进程的数据。
+未设置时只输出当前进程的指标。
+"""
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest,
+)
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# 单次排盘多在毫秒以内，默认分桶（5ms 起）过粗
+_REQUEST_BUCKETS = (.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5)
+_STAGE_BUCKETS = (.000005, .00001, .000025, .00005, .0001, .00025, .0005, .001, .0025, .005, .01, .025, .1)
+
+# 起卦类型归一为固定的标签值，避免任意输入导致标签基数膨胀
+DIVINATION_TYPE_LABELS = {
+    "时间起卦": "time", "time": "time",
+    "手工指定": "manual", "manual": "manual",
+    "卦名起卦": "name", "name": "name",
+}
+
+DIVINATION_REQUESTS = Counter(
+    "liuyao_divination_requests_total", "排盘请求数", ["divination_type", "status"])
+DIVINATION_LATENCY = Histogram(
+    "liuyao_divination_request_seconds", "排盘请求耗时", ["divination_type"], buckets=_REQUEST_BUCKETS)
+
+STAGE_LATENCY = Histogram(
+    "liuyao_divination_stage_seconds", "排盘各阶段耗时", ["stage"], buckets=_STAGE_BUCKETS)
+# 农历换算（农历日期、四柱）、卦象查表（本卦/变卦的纳甲六亲片段）、序列化
+CALENDAR_STAGE = STAGE_LATENCY.labels("calendar")
+HEXAGRAM_STAGE = STAGE_LATENCY.labels("hexagram")
+SERIALIZE_STAGE = STAGE_LATENCY.labels("serialize")
+
+CACHE_REQUESTS = Counter(
+    "liuyao_result_cache_requests_total", "排盘结果缓存查询数", ["result"])
+CACHE_HITS = CACHE_REQUESTS.labels("hit")
+CACHE_MISSES = CACHE_REQUESTS.labels("miss")
+CACHE_ENTRIES = Gauge(
+    "liuyao_result_cache_entries", "排盘结果缓存条目数（各进程之和）", multiprocess_mode="livesum")
+
+EXECUTOR_RUNNING = Gauge(
+    "liuyao_executor_running", "排盘线程池正在执行的任务数", multiprocess_mode="livesum")
+EXECUTOR_QUEUED = Gauge(
+    "liuyao_executor_queued", "排盘线程池排队中的任务数", multiprocess_mode="livesum")
+EXECUTOR_REJECTED = Counter(
+    "liuyao_executor_rejected_total", "排盘线程池因队列已满拒绝的任务数")
+EXECUTOR_QUEUE_WAIT = Histogram(
+    "liuyao_executor_queue_wait_seconds", "任务从提交到开始执行的等待时间", buckets=_REQUEST_BUCKETS)
+
+AUTH_REJECTED = Counter(
+    "liuyao_auth_rejected_total", "API Key 验证失败数（按判定环节）", ["stage"])
+# bloom：布隆过滤器判定不存在，未访问数据库；db：通过过滤器但数据库中无此有效 Key
+AUTH_REJECTED_BLOOM = AUTH_REJECTED.labels("bloom")
+AUTH_REJECTED_DB = AUTH_REJECTED.labels("db")
+
+RATE_LIMITED = Counter(
+    "liuyao_rate_limited_total", "因超出 API Key 限流返回 429 的请求数")
+
+HISTORY_RECORDS = Counter(
+    "liuyao_history_records_total", "排盘记录数（按结果）", ["result"])
+HISTORY_WRITTEN = HISTORY_RECORDS.labels("written")
+HISTORY_DROPPED = HISTORY_RECORDS.labels("dropped")           # 队列已满
+HISTORY_WRITE_ERRORS = HISTORY_RECORDS.labels("write_error")  # 写入数据库失败
+HISTORY_QUEUE_DEPTH = Gauge(
+    "liuyao_history_queue_depth", "排盘记录队列中待写入的条数（各进程之和）", multiprocess_mode="livesum")
+HISTORY_FLUSH_LATENCY = Histogram(
+    "liuyao_history_flush_seconds", "每批排盘记录写入数据库的耗时", buckets=_REQUEST_BUCKETS)
+
+LOG_RECORDS_DROPPED = Counter(
+    "liuyao_log_records_dropped_total", "日志队列已满而丢弃的记录数")
+
+
+def divination_type_label(divination_type: str) -> str:
+    return DIVINATION_TYPE_LABELS.get(divination_type, "unknown")
+
+
+def render_metrics() -> bytes:
+    """Prometheus 文本格式的全部指标"""
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_process_dead() -> None:
+    """进程退出时清理本进程的 live* 仪表文件，避免已退出 worker 的数值残留在汇总中"""
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(os.getpid())
+
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
@@ -0,0 +1,48 @@
+# app/services/prewarm.py
+"""
+时间起卦结果预热
+
+后台协程在每个整点前 lead_seconds 秒计算下一小时的时间起卦结果并写入缓存，
+整点后的第一个"当前时间"请求即可直接命中，不必等待农历换算。
+  LIUYAO_PREWARM          是否启用（默认 1）
+  LIUYAO_PREWARM_LEAD     提前秒数（默认 30）
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+
+from .enhanced_divination_service import prewarm_time_divination
+
+logger = logging.getLogger(__name__)
+
+PREWARM_ENABLED = os.getenv("LIUYAO_PREWARM", "1") != "0"
+PREWARM_LEAD_SECONDS = float(os.getenv("LIUYAO_PREWARM_LEAD", "30"))
+
+
+def next_hour(now: datetime) -> datetime:
+    return now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+
+
+async def _prewarm(target: datetime) -> None:
+    try:
+        # 农历换算是 CPU 计算，放到线程中执行以免阻塞事件循环
+        await asyncio.to_thread(prewarm_time_divination, target)
+    except Exception:
+        # 预热失败只影响命中率；异常不能结束任务，否则会在服务关闭等待任务时重新抛出
+        logger.exception("预热 %s 的时间起卦结果失败", target)
+
+
+async def prewarm_loop(lead_seconds: float = PREWARM_LEAD_SECONDS) -> None:
+    """持续运行，直到被取消"""
+    # 启动时先预热当前小时
+    await _prewarm(datetime.now())
+    while True:
+        now = datetime.now()
+        boundary = next_hour(now)
+        delay = (boundary - now).total_seconds() - lead_seconds
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await _prewarm(boundary)
+        # 等到越过整点再计算下一个目标
+        await asyncio.sleep(max((boundary - datetime.now()).total_seconds(), 0) + 1)
@@ -0,0 +1,170 @@
+# app/services/profiling.py
+"""
+按请求的 CPU 剖析（默认关闭）
+
+启用后，命中条件的请求在 cProfile 下执行，结果写入目录，文件名带时间、请求 ID 与起卦类型。
+触发条件（满足其一）：
+  - 请求头 X-Profile 的值等于 LIUYAO_PROFILE_TOKEN（未设置令牌时不接受请求头触发）
+  - 按 LIUYAO_PROFILE_SAMPLE_RATE 随机采样
+事件循环线程上的剖析覆盖该请求从进入到返回响应头的整个区间（期间事件循环上其他并发请求的
+执行也会被计入）；交给排盘线程池的计算在工作线程中单独剖析后合并到同一份结果。
+流式响应只剖析到开始返回为止。同一进程同时只剖析一个请求，其余请求照常处理。
+未启用时不注册中间件与接口，请求路径上没有任何额外开销。
+  LIUYAO_PROFILE              是否启用（默认 0）
+  LIUYAO_PROFILE_DIR          输出目录（默认 app/profiles）
+  LIUYAO_PROFILE_TOKEN        X-Profile 请求头需匹配的令牌
+  LIUYAO_PROFILE_SAMPLE_RATE  随机采样比例（默认 0）
+  LIUYAO_PROFILE_FORMAT       pstats（.prof，可用 pstats / snakeviz 查看）或 text（按累计耗时排序的文本）
+  LIUYAO_PROFILE_KEEP         最多保留的文件数（默认 200）
+"""
+import asyncio
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import threading
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
+
+from .logging_setup import current_request_fields, current_request_id
+from .metrics import divination_type_label
+
+PROFILE_ENABLED = os.getenv("LIUYAO_PROFILE", "0") == "1"
+PROFILE_DIR = os.getenv("LIUYAO_PROFILE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), 'profiles'))
+PROFILE_TOKEN = os.getenv("LIUYAO_PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("LIUYAO_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_FORMAT = os.getenv("LIUYAO_PROFILE_FORMAT", "pstats")
+PROFILE_KEEP = int(os.getenv("LIUYAO_PROFILE_KEEP", "200"))
+
+PROFILE_HEADER = "x-profile"
+_EXTENSIONS = {"pstats": ".prof", "text": ".txt"}
+_FILE_PATTERN = re.compile(r'^(\d{8}T\d{12})_([A-Za-z0-9-]+)_([a-z]+)\.(prof|txt)$')
+
+# 当前请求在工作线程中产生的剖析结果
+_worker_profiles: contextvars.ContextVar[Optional[List[cProfile.Profile]]] = \
+    contextvars.ContextVar("worker_profiles", default=None)
+_busy = threading.Lock()
+
+
+def _should_profile(request) -> bool:
+    token = request.headers.get(PROFILE_HEADER)
+    if PROFILE_TOKEN and token is not None and token == PROFILE_TOKEN:
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def profile_in_worker(fn: Callable) -> Callable:
+    """
+    排盘线程池的任务包装（在提交任务的上下文中调用）
+    当前请求正在剖析时，在工作线程中另起一个 profiler 执行 fn
+    """
+    profiles = _worker_profiles.get()
+    if profiles is None:
+        return fn
+
+    @wraps(fn)
+    def run(*args, **kwargs):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12 起 cProfile 基于进程级的 sys.monitoring，事件循环线程上的 profiler 已覆盖所有线程
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+            profiles.append(profiler)
+    return run
+
+
+def _file_name(request_id: Optional[str], divination_type: Optional[str]) -> str:
+    stamp = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+    rid = re.sub(r'[^A-Za-z0-9-]', '', request_id or '')[:64] or 'none'
+    label = divination_type_label(divination_type) if divination_type else 'none'
+    return f"{stamp}_{rid}_{label}{_EXTENSIONS.get(PROFILE_FORMAT, '.prof')}"
+
+
+def _write(stats: pstats.Stats, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if PROFILE_FORMAT == "text":
+        buffer = io.StringIO()
+        stats.stream = buffer
+        stats.sort_stats("cumulative").print_stats(60)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(buffer.getvalue())
+    else:
+        stats.dump_stats(path)
+    _prune()
+
+
+def _prune() -> None:
+    names = sorted(name for name in os.listdir(PROFILE_DIR) if _FILE_PATTERN.match(name))
+    for name in names[:max(0, len(names) - PROFILE_KEEP)]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, name))
+        except FileNotFoundError:
+            pass
+
+
+async def profiling_middleware(request, call_next):
+    """
+    HTTP 中间件，需注册在 request_context 之内（先注册），才能取得请求 ID 与起卦类型
+    """
+    if not _should_profile(request) or not _busy.acquire(blocking=False):
+        return await call_next(request)
+    profiles: List[cProfile.Profile] = []
+    token = _worker_profiles.set(profiles)
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            response = await call_next(request)
+        finally:
+            profiler.disable()
+    finally:
+        _worker_profiles.reset(token)
+        _busy.release()
+
+    stats = pstats.Stats(profiler)
+    for worker_profile in profiles:
+        stats.add(worker_profile)
+    name = _file_name(current_request_id(), (current_request_fields() or {}).get("divination_type"))
+    await asyncio.to_thread(_write, stats, os.path.join(PROFILE_DIR, name))
+    response.headers["X-Profile-File"] = name
+    return response
+
+
+def list_profiles(limit: int = 50) -> List[Dict[str, Any]]:
+    """最近的剖析文件，新的在前"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    entries = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        match = _FILE_PATTERN.match(name)
+        if match is None:
+            continue
+        stamp, request_id, divination_type, ext = match.groups()
+        entries.append({
+            'name': name,
+            'created': datetime.strptime(stamp, '%Y%m%dT%H%M%S%f').isoformat(),
+            'request_id': request_id,
+            'divination_type': divination_type,
+            'format': 'text' if ext == 'txt' else 'pstats',
+            'size': os.path.getsize(os.path.join(PROFILE_DIR, name)),
+        })
+        if len(entries) >= limit:
+            break
+    return entries
+
+
+def profile_path(name: str) -> Optional[str]:
+    """按文件名取剖析文件路径，名称不合法或文件不存在时返回 None"""
+    if not _FILE_PATTERN.match(name):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
@@ -0,0 +1,77 @@
+# app/services/rate_limiter.py
+"""
+按 API Key 的令牌桶限流（进程内）
+
+每个 Key 一个令牌桶：容量 burst，每秒补充 rate 个令牌，每个请求消耗一个；
+令牌不足时返回需要等待的秒数，由接口转成 429 与 Retry-After。
+桶按 Key 分到若干分片，各分片一把锁，线程池与事件循环同时访问时只在同一分片上竞争。
+状态只在本进程内：uvicorn 开 N 个 worker 时，单个 Key 实际可用的速率约为 N × rate。
+每个 Key 的 rate / burst 可在 api_keys 表中单独设置（为空时使用下面的默认值）。
+  LIUYAO_RATE_LIMIT       默认每秒请求数（默认 0，即不限流）
+  LIUYAO_RATE_BURST       默认突发容量（默认 0，即取 max(1, rate)）
+  LIUYAO_RATE_SHARDS      分片数（默认 16）
+"""
+import math
+import os
+import threading
+import time
+from typing import Dict, Hashable, List, Optional, Tuple
+
+RATE_LIMIT = float(os.getenv("LIUYAO_RATE_LIMIT", "0"))
+RATE_BURST = float(os.getenv("LIUYAO_RATE_BURST", "0"))
+RATE_SHARDS = int(os.getenv("LIUYAO_RATE_SHARDS", "16"))
+
+
+def resolve_limit(rate: Optional[float], burst: Optional[float]) -> Optional[Tuple[float, float]]:
+    """
+    合并 Key 自身的设置与默认值
+    :return: (rate, burst)；rate 为 0 表示不限流，返回 None
+    """
+    if rate is None:
+        rate = RATE_LIMIT
+        burst = burst if burst is not None else (RATE_BURST or None)
+    if rate <= 0:
+        return None
+    return rate, burst if burst else max(1.0, rate)
+
+
+class TokenBucketLimiter:
+    """分片的令牌桶集合，桶的状态为 (剩余令牌, 上次更新时刻)"""
+
+    def __init__(self, shards: int = RATE_SHARDS):
+        self._shards: List[Tuple[threading.Lock, Dict[Hashable, Tuple[float, float]]]] = [
+            (threading.Lock(), {}) for _ in range(max(1, shards))
+        ]
+
+    def acquire(self, key: Hashable, rate: float, burst: float, cost: float = 1.0) -> float:
+        """
+        取 cost 个令牌
+        :return: 0 表示放行；否则为令牌足够前需要等待的秒数（本次不扣令牌）
+        """
+        lock, buckets = self._shards[hash(key) % len(self._shards)]
+        now = time.monotonic()
+        with lock:
+            state = buckets.get(key)
+            tokens = burst if state is None else min(burst, state[0] + (now - state[1]) * rate)
+            if tokens >= cost:
+                buckets[key] = (tokens - cost, now)
+                return 0.0
+            buckets[key] = (tokens, now)
+        return (cost - tokens) / rate
+
+    def reset(self, key: Hashable = None) -> None:
+        """清除某个 Key（或全部）的桶状态"""
+        for lock, buckets in self._shards:
+            with lock:
+                if key is None:
+                    buckets.clear()
+                else:
+                    buckets.pop(key, None)
+
+
+def retry_after_header(wait: float) -> str:
+    """Retry-After 只接受整数秒，向上取整且至少为 1"""
+    return str(max(1, math.ceil(wait)))
+
+
+RATE_LIMITER = TokenBucketLimiter()
@@ -0,0 +1,77 @@
+# app/services/result_cache.py
+"""
+排盘结果缓存
+
+有界 LRU + TTL，线程安全，并统计命中/未命中次数。
+缓存大小与过期时间通过环境变量配置：
+  LIUYAO_RESULT_CACHE_SIZE  最大条目数（默认 4096，0 表示关闭缓存）
+  LIUYAO_RESULT_CACHE_TTL   过期秒数（默认 7200）
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from .metrics import CACHE_ENTRIES, CACHE_HITS, CACHE_MISSES
+
+
+class ResultCache:
+    """有界 LRU + TTL 缓存"""
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 7200):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (过期时刻, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] <= now:
+                if item is not None:
+                    del self._data[key]
+                    CACHE_ENTRIES.set(len(self._data))
+                self.misses += 1
+                CACHE_MISSES.inc()
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            CACHE_HITS.inc()
+            return item[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            CACHE_ENTRIES.set(len(self._data))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            CACHE_ENTRIES.set(0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+            }
+
+
+RESULT_CACHE = ResultCache(
+    maxsize=int(os.getenv("LIUYAO_RESULT_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("LIUYAO_RESULT_CACHE_TTL", "7200")),
+)
@@ -0,0 +1,138 @@
+# app/services/time_calendar.py
+"""
+预计算的时间起卦日历（1900-2100）
+
+时间起卦的结果由所在小时决定（lunar_date 中含钟点，故以小时而非时辰为槽位），
+每个小时一条 8 字节定长记录：
+    ben, moving_line, year_gz, month_gz, day_gz, hour_gz, lunar_month(int8), lunar_day
+农历年由公历年推出：公历 1、2 月而农历月为十一、十二月时属上一农历年（生成时逐条校验）。
+小时内恰有节交接（年柱或月柱在小时内变化）的槽位 ben 记为 0xFF，查询时回退到实时计算。
+
+文件 mmap 映射，多进程共享；查询为 O(1) 的偏移计算。
+  LIUYAO_TIME_CALENDAR  文件路径（默认 app/data/time_calendar_1900_2100.bin，文件不存在则不启用）
+生成（在 app 目录下）：python -m services.time_calendar build [输出路径] [进程数]
+"""
+import mmap
+import os
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .batch_engine import compute_time_batch
+
+DEFAULT_CALENDAR_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data',
+                                     'time_calendar_1900_2100.bin')
+
+# 文件头：魔数、起止年份、记录数
+_HEADER = struct.Struct('<8sHHI')
+_MAGIC = b'LYTIME01'
+_RECORD = struct.Struct('<BBBBBBbB')
+UNSTABLE = 0xFF
+
+# (ben, moving_line, year_gz, month_gz, day_gz, hour_gz, lunar_month, lunar_day)
+TimeRecord = Tuple[int, int, int, int, int, int, int, int]
+
+
+def lunar_year_of(dt: datetime, lunar_month: int) -> int:
+    """由公历年与农历月推出农历年"""
+    if dt.month <= 2 and abs(lunar_month) >= 11:
+        return dt.year - 1
+    return dt.year
+
+
+class TimeCalendar:
+    """mmap 映射的按小时时间起卦日历"""
+
+    def __init__(self, path: str = DEFAULT_CALENDAR_PATH):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.start_year, self.end_year, self.count = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC:
+            raise ValueError(f"不是有效的时间起卦日历文件: {path}")
+        self._base_ordinal = date(self.start_year, 1, 1).toordinal()
+
+    def lookup(self, dt: datetime) -> Optional[TimeRecord]:
+        """返回 dt 所在小时的记录；超出范围或该小时内有节交接时返回 None"""
+        slot = (dt.toordinal() - self._base_ordinal) * 24 + dt.hour
+        if not 0 <= slot < self.count:
+            return None
+        record = _RECORD.unpack_from(self._mmap, _HEADER.size + slot * _RECORD.size)
+        if record[0] == UNSTABLE:
+            return None
+        return record
+
+
+def _build_year(year: int) -> bytes:
+    """生成一年的全部记录"""
+    starts = np.arange(f'{year}-01-01T00', f'{year + 1}-01-01T00', dtype='datetime64[h]').astype('datetime64[s]')
+    batch = compute_time_batch(starts)
+    # 该小时最后一秒的年柱、月柱与整点不同，说明小时内有节交接
+    ends = compute_time_batch(starts + np.timedelta64(3599, 's'))
+    unstable = (batch.year_gz != ends.year_gz) | (batch.month_gz != ends.month_gz)
+
+    ben = np.where(unstable, UNSTABLE, batch.ben)
+    records = np.stack([
+        ben, batch.moving_line, batch.year_gz, batch.month_gz, batch.day_gz, batch.hour_gz,
+        batch.lunar_month, batch.lunar_day,
+    ], axis=1)
+
+    months = starts.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    expected_year = np.where((months <= 2) & (np.abs(batch.lunar_month) >= 11), year - 1, year)
+    if not np.array_equal(expected_year, batch.lunar_year):
+        raise AssertionError(f"{year} 年存在无法由公历年推出的农历年")
+
+    # lunar_month 为负（闰月）时按 int8 的补码写入
+    return (records % 256).astype(np.uint8).tobytes()
+
+
+def build_calendar(path: str = DEFAULT_CALENDAR_PATH, start_year: int = 1900, end_year: int = 2100,
+                   workers: Optional[int] = None) -> int:
+    """
+    多进程生成日历文件，按年分片
+    :return: 记录数
+    """
+    years = list(range(start_year, end_year + 1))
+    tmp_path = path + '.tmp'
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    count = 0
+    with open(tmp_path, 'wb') as f, ProcessPoolExecutor(max_workers=workers) as pool:
+        f.write(_HEADER.pack(_MAGIC, start_year, end_year, 0))
+        for chunk in pool.map(_build_year, years):
+            f.write(chunk)
+            count += len(chunk) // _RECORD.size
+        f.seek(0)
+        f.write(_HEADER.pack(_MAGIC, start_year, end_year, count))
+    os.replace(tmp_path, path)
+    return count
+
+
+_calendar = None
+_calendar_loaded = False
+
+
+def get_time_calendar() -> Optional[TimeCalendar]:
+    """按环境变量加载日历，文件不存在时返回 None"""
+    global _calendar, _calendar_loaded
+    if not _calendar_loaded:
+        path = os.getenv("LIUYAO_TIME_CALENDAR", DEFAULT_CALENDAR_PATH)
+        _calendar = TimeCalendar(path) if os.path.exists(path) else None
+        _calendar_loaded = True
+    return _calendar
+
+
+if __name__ == "__main__":
+    # 在 app 目录下运行: python -m services.time_calendar build [输出路径] [进程数]
+    # 未指定农历后端时使用已校验过的 table 后端，逐条调用 lunar_python 过慢
+    os.environ.setdefault("LIUYAO_CALENDAR_BACKEND", "table")
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+    if command != "build":
+        print(f"未知命令: {command}")
+        sys.exit(1)
+    output = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_CALENDAR_PATH
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    print(f"已生成 {output}（{build_calendar(output, workers=workers)} 条记录）")
@@ -2,27 +2,52 @@ from datetime import datetime
 from typing import Dict
 from lunar_python import Lunar
 
+from . import ganzhi
+from .calendar_backend import get_calendar_backend
+
 class LunarDateTimeConverter:
     def __init__(self, dt: datetime = None):
         if dt is None:
             dt = datetime.now()
-        self.lunar = Lunar.fromDate(dt)
-        
+        self.dt = dt
+        self._lunar = None
+
+    @property
+    def lunar(self) -> Lunar:
+        """lunar_python 农历对象，仅在调用方直接访问时才构建"""
+        if self._lunar is None:
+            self._lunar = Lunar.fromDate(self.dt)
+        return self._lunar
+
     def get_basic_info(self) -> Dict:
-        """获取基础农历信息"""
+        """获取基础农历信息，农历日期由当前配置的农历后端给出"""
+        year, month, day = get_calendar_backend().lunar_date(self.dt)
         return {
-            'year': self.lunar.getYear(),
-            'month': self.lunar.getMonth(),
-            'day': self.lunar.getDay(),
-            'hour': self.lunar.getHour(),
-            'minute': self.lunar.getMinute()
+            'year': year,
+            'month': month,
+            'day': day,
+            'hour': self.dt.hour,
+            'minute': self.dt.minute
         }
-    
+
+    def get_day_ganzhi(self) -> str:
+        """日柱（纯算术计算）"""
+        return ganzhi.day_ganzhi(self.dt)
+
+    def get_hour_ganzhi(self) -> str:
+        """时柱（纯算术计算）"""
+        return ganzhi.hour_ganzhi(self.dt)
+
+    def get_day_tiangan(self) -> str:
+        """日干，用于起六神"""
+        return self.get_day_ganzhi()[0]
+
     def get_ganzhi_info(self) -> Dict:
-        """获取干支信息"""
+        """获取干支信息，年柱、月柱依赖节气，由当前配置的农历后端给出"""
+        year_gz, month_gz = get_calendar_backend().year_month_ganzhi(self.dt)
         return {
-            'year_gz': self.lunar.getYearInGanZhiExact(),
-            'month_gz': self.lunar.getMonthInGanZhiExact(),
-            'day_gz': self.lunar.getDayInGanZhi(),
-            'hour_gz': self.lunar.getTimeInGanZhi()
-        }
\ No newline at end of file
+            'year_gz': year_gz,
+            'month_gz': month_gz,
+            'day_gz': self.get_day_ganzhi(),
+            'hour_gz': self.get_hour_ganzhi()
+        }
@@ -0,0 +1,89 @@
+# app/usage.py
+"""
+API Key 用量统计（写后回写）
+
+请求路径上只在内存中按 (Key, 小时) 累加计数，不访问数据库；
+后台任务每隔 LIUYAO_USAGE_FLUSH_INTERVAL 秒把累计的计数在一个事务中批量写入 api_key_usage
+（与已有的行相加，多个 worker 各自写入互不覆盖），服务关闭时再写一次。
+写入失败时计数并回内存，下次一并重试；进程异常退出时最多丢失一个周期的计数。
+  LIUYAO_USAGE_FLUSH_INTERVAL   写入间隔秒数（默认 5）
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import DefaultDict, List, Tuple
+
+import crud
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+USAGE_FLUSH_INTERVAL = float(os.getenv("LIUYAO_USAGE_FLUSH_INTERVAL", "5"))
+
+
+class UsageRecorder:
+    """(key_id, 小时序号) -> [放行数, 拒绝数]"""
+
+    def __init__(self):
+        self._counts: DefaultDict[Tuple[int, int], List[int]] = defaultdict(lambda: [0, 0])
+        self._lock = threading.Lock()
+
+    def record(self, key_id: int, allowed: bool) -> None:
+        hour = int(time.time() // 3600)
+        with self._lock:
+            self._counts[(key_id, hour)][0 if allowed else 1] += 1
+
+    def _take(self) -> DefaultDict[Tuple[int, int], List[int]]:
+        with self._lock:
+            counts, self._counts = self._counts, defaultdict(lambda: [0, 0])
+        return counts
+
+    def _restore(self, counts) -> None:
+        with self._lock:
+            for key, (requests, rejected) in counts.items():
+                current = self._counts[key]
+                current[0] += requests
+                current[1] += rejected
+
+    def flush(self) -> int:
+        """把累计的计数写入数据库（同步，应在线程中调用），返回写入的行数"""
+        counts = self._take()
+        if not counts:
+            return 0
+        rows = [
+            {'key_id': key_id,
+             'period': datetime.fromtimestamp(hour * 3600, timezone.utc).replace(tzinfo=None),
+             'requests': requests, 'rejected': rejected}
+            for (key_id, hour), (requests, rejected) in counts.items()
+        ]
+        try:
+            with SessionLocal() as db:
+                crud.add_usage(db, rows)
+        except Exception:
+            self._restore(counts)
+            raise
+        return len(rows)
+
+    def pending(self) -> int:
+        return len(self._counts)
+
+
+USAGE_RECORDER = UsageRecorder()
+
+
+async def usage_flush_loop(interval: float = USAGE_FLUSH_INTERVAL) -> None:
+    """持续运行，直到被取消；取消时不再写入，由调用方在关闭时调用 flush_usage"""
+    while True:
+        await asyncio.sleep(interval)
+        await flush_usage()
+
+
+async def flush_usage() -> None:
+    try:
+        await asyncio.to_thread(USAGE_RECORDER.flush)
+    except Exception:
+        logger.exception("写入 API Key 用量失败", extra={"pending": USAGE_RECORDER.pending()})
@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+"""排盘引擎与 API 的基准测试，运行方式见 benchmarks/__main__.py"""
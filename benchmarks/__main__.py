@@ -0,0 +1,100 @@
+# benchmarks/__main__.py
+"""
+在仓库根目录下运行：
+  python -m benchmarks run [-o 结果.json] [-k 名称片段] [--min-time 秒] [--repeat 轮数] [--skip-api] [--skip-auth]
+                           [--baseline 基线.json] [--threshold 0.1]
+  python -m benchmarks compare 基线.json 结果.json [--threshold 0.1]
+compare（以及带 --baseline 的 run）在任一基准的吞吐比基线下降超过 threshold 时以退出码 1 结束，
+可直接用作 CI 的回归门槛。基线即先前某次 run 输出的结果文件，需在同一台机器、同一配置下生成。
+"""
+import argparse
+import asyncio
+import sys
+from typing import List
+
+from .harness import BenchResult, bench, bench_async, compare, load_results, print_result, write_results
+
+
+def run_benchmarks(pattern: str = "", min_time: float = 1.0, repeat: int = 5,
+                   skip_api: bool = False, skip_auth: bool = False) -> List[BenchResult]:
+    from .engine import ENGINE_BENCHMARKS, result_cache_disabled
+
+    results = []
+    for name, factory, uncached in ENGINE_BENCHMARKS:
+        if pattern not in name:
+            continue
+        if uncached:
+            with result_cache_disabled():
+                result = bench(name, factory(), min_time, repeat)
+        else:
+            result = bench(name, factory(), min_time, repeat)
+        print_result(result)
+        results.append(result)
+
+    if not skip_auth:
+        from .auth import run_auth_benchmarks
+        results += run_auth_benchmarks(pattern, min_time, repeat)
+
+    if skip_api:
+        return results
+    from .api import API_BENCHMARKS, api_benchmark, make_client
+
+    loop = asyncio.new_event_loop()
+    client = make_client()
+    try:
+        for name, divination_type, uncached in API_BENCHMARKS:
+            if pattern not in name:
+                continue
+            fn = api_benchmark(client, divination_type, uncached)
+            if uncached:
+                with result_cache_disabled():
+                    result = bench_async(name, fn, min_time, repeat, loop)
+            else:
+                result = bench_async(name, fn, min_time, repeat, loop)
+            print_result(result)
+            results.append(result)
+    finally:
+        loop.run_until_complete(client.aclose())
+        loop.close()
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="六爻排盘基准测试")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="运行基准并输出 JSON 结果")
+    run.add_argument("-o", "--output", default="benchmark_results.json", help="结果文件路径")
+    run.add_argument("-k", "--filter", default="", help="只运行名称包含该片段的基准")
+    run.add_argument("--min-time", type=float, default=1.0, help="每项基准的总计时秒数")
+    run.add_argument("--repeat", type=int, default=5, help="每项基准的重复轮数")
+    run.add_argument("--skip-api", action="store_true", help="跳过端到端 API 基准")
+    run.add_argument("--skip-auth", action="store_true", help="跳过认证路径（查库）基准")
+    run.add_argument("--baseline", help="运行后与该基准结果对比")
+    run.add_argument("--threshold", type=float, default=0.1, help="允许的吞吐下降比例")
+
+    cmp = sub.add_parser("compare", help="对比两次结果，吞吐回退超过阈值时退出码为 1")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--threshold", type=float, default=0.1, help="允许的吞吐下降比例")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        results = run_benchmarks(args.filter, args.min_time, args.repeat, args.skip_api, args.skip_auth)
+        write_results(args.output, results)
+        print(f"结果已写入 {args.output}")
+        if not args.baseline:
+            return 0
+        current = {r.name: r._asdict() for r in results}
+    else:
+        current = load_results(args.current)
+
+    regressions = compare(load_results(args.baseline), current, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} 项吞吐下降超过 {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+# benchmarks/api.py
+"""
+/enhanced-divination 的端到端基准
+
+通过 httpx 的 ASGITransport 在进程内直接调用 ASGI 应用（含认证、请求校验、中间件、序列化），
+不经过网络与 uvicorn；不触发 lifespan，因此没有后台预热，日志保持默认的 WARNING 级别。
+"""
+import os
+from datetime import datetime, timedelta
+from itertools import cycle
+from typing import Awaitable, Callable, List, Tuple
+
+import httpx
+
+from .harness import PAYLOADS, ensure_app_path
+
+ensure_app_path()
+
+import main  # noqa: E402
+
+
+def make_client() -> httpx.AsyncClient:
+    # 应用在本进程内运行，服务端也从环境变量读取同一个 Key
+    api_key = os.environ.setdefault("API_KEY", "your-secret-api-key")
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench",
+                             headers={"Authorization": f"Bearer {api_key}"})
+
+
+def api_benchmark(client: httpx.AsyncClient, divination_type: str, vary: bool) -> Callable[[], Awaitable]:
+    payload = PAYLOADS[divination_type]
+    if not vary:
+        body = dict(payload, target_time="2024-05-01T10:30:00")
+        bodies = cycle([body])
+    else:
+        start = datetime(2024, 5, 1, 10, 30)
+        bodies = cycle([dict(payload, target_time=(start + timedelta(hours=37 * i)).isoformat())
+                        for i in range(4096)])
+
+    async def run():
+        response = await client.post("/enhanced-divination", json=next(bodies))
+        if response.status_code != 200:
+            raise RuntimeError(f"{divination_type}: {response.status_code} {response.text}")
+    return run
+
+
+# (名称, 起卦类型, 是否使用分散时刻并关闭结果缓存)
+API_BENCHMARKS: List[Tuple[str, str, bool]] = [
+    (f"api.enhanced-divination[{divination_type},{'uncached' if vary else 'cached'}]", divination_type, vary)
+    for divination_type in PAYLOADS for vary in (False, True)
+]
+
@@ -0,0 +1,122 @@
+# benchmarks/auth.py
+"""
+认证路径的基准
+
+在临时 SQLite 文件（连接设置与服务相同：WAL、busy_timeout 等）中写入一批 Key，
+对比缓存未命中时的两种查库方式：
+  thread  同步引擎 + asyncio.to_thread（默认）
+  async   aiosqlite 异步引擎（LIUYAO_DB_ASYNC=1）
+每次操作清空认证缓存后并发验证 N 个不同的 Key（x1 即逐个验证），ops/s 乘以 N 为每秒查库次数。
+另测缓存命中与布隆过滤器拒绝两条不访问数据库的路径作对照。
+"""
+import asyncio
+import os
+import secrets
+import shutil
+import tempfile
+from contextlib import contextmanager
+from itertools import cycle
+from typing import Awaitable, Callable, Iterator, List
+
+from sqlalchemy.orm import sessionmaker
+
+from .harness import BenchResult, bench_async, ensure_app_path, print_result
+
+ensure_app_path()
+
+import auth  # noqa: E402
+import crud  # noqa: E402
+import database  # noqa: E402
+from database import Base, make_async_engine, make_engine  # noqa: E402
+
+KEY_COUNT = 1000
+CONCURRENCY = (1, 32)
+
+
+@contextmanager
+def temporary_database() -> Iterator[str]:
+    """写入 KEY_COUNT 个 Key 的临时库，返回地址"""
+    directory = tempfile.mkdtemp(prefix="liuyao-auth-bench-")
+    url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    engine = make_engine(url)
+    try:
+        import models  # 导入即把模型注册到 Base.metadata
+        Base.metadata.create_all(bind=engine)
+        with sessionmaker(bind=engine)() as db:
+            for i in range(KEY_COUNT):
+                db.add(models.ApiKey(key=secrets.token_urlsafe(32), owner=f"bench{i}"))
+            db.commit()
+        yield url
+    finally:
+        engine.dispose()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+@contextmanager
+def auth_sessions(sync_engine, async_engine) -> Iterator[None]:
+    """让 auth 模块改用基准库；async_engine 为 None 时走线程查库"""
+    saved = database.SessionLocal, database.AsyncSessionLocal, auth.SessionLocal
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
+    database.SessionLocal = auth.SessionLocal = session_factory
+    if async_engine is not None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        database.AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    else:
+        database.AsyncSessionLocal = None
+    auth.API_KEY_CACHE.clear()
+    auth.API_KEY_CACHE.key_filter = None
+    try:
+        yield
+    finally:
+        database.SessionLocal, database.AsyncSessionLocal, auth.SessionLocal = saved
+        auth.API_KEY_CACHE.clear()
+
+
+def _lookups(keys: List[str], concurrency: int) -> Callable[[], Awaitable]:
+    key_cycle = cycle(keys)
+
+    async def run():
+        auth.API_KEY_CACHE.clear()
+        results = await asyncio.gather(*(auth.authenticate(next(key_cycle)) for _ in range(concurrency)))
+        if None in results:
+            raise RuntimeError("有效 Key 验证失败")
+    return run
+
+
+def _cached(key: str) -> Callable[[], Awaitable]:
+    return lambda: auth.authenticate(key)
+
+
+def _bloom_rejected(keys: List[str]) -> Callable[[], Awaitable]:
+    auth.API_KEY_CACHE.key_filter = auth.BloomFilter.from_digests(auth.hash_key(key) for key in keys)
+    bogus = cycle([secrets.token_urlsafe(32) for _ in range(4096)])
+    return lambda: auth.authenticate(next(bogus))
+
+
+def run_auth_benchmarks(pattern: str = "", min_time: float = 1.0, repeat: int = 5) -> List[BenchResult]:
+    results = []
+    loop = asyncio.new_event_loop()
+    with temporary_database() as url:
+        sync_engine = make_engine(url)
+        with sessionmaker(bind=sync_engine)() as db:
+            keys = crud.get_active_keys(db)
+        for mode in ("thread", "async"):
+            async_engine = make_async_engine(url) if mode == "async" else None
+            try:
+                with auth_sessions(sync_engine, async_engine):
+                    cases = [(f"auth.db-lookup[{mode},x{n}]", lambda n=n: _lookups(keys, n)) for n in CONCURRENCY]
+                    if mode == "thread":
+                        cases += [("auth.cached", lambda: _cached(keys[0])),
+                                  ("auth.bloom-rejected", lambda: _bloom_rejected(keys))]
+                    for name, factory in cases:
+                        if pattern not in name:
+                            continue
+                        result = bench_async(name, factory(), min_time, repeat, loop)
+                        print_result(result)
+                        results.append(result)
+            finally:
+                if async_engine is not None:
+                    loop.run_until_complete(async_engine.dispose())
+        sync_engine.dispose()
+    loop.close()
+    return results
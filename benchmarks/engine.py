@@ -0,0 +1,105 @@
+# benchmarks/engine.py
+"""
+排盘引擎的微基准
+
+perform_* 按小时缓存结果，分别测缓存命中（固定时间）与关闭缓存后的完整计算。
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import cycle
+from typing import Callable, Iterator, List, Tuple
+
+from .harness import ensure_app_path
+
+ensure_app_path()
+
+from services import constants  # noqa: E402
+from services.calculator import HexagramCalculator  # noqa: E402
+from services.enhanced_divination_service import (  # noqa: E402
+    get_enhanced_hexagram_details, parse_yao_details,
+    perform_manual_divination, perform_name_divination, perform_time_divination,
+)
+from services.result_cache import RESULT_CACHE  # noqa: E402
+from services.time_converter import LunarDateTimeConverter  # noqa: E402
+
+FIXED_TIME = datetime(2024, 5, 1, 10, 30)
+MANUAL_YAOS = ['阳爻', '阴爻动', '阳爻', '阴爻', '阳爻动', '阴爻']
+NAMES = ('乾', '坤', '坎', '离')
+
+
+@contextmanager
+def result_cache_disabled():
+    """临时关闭结果缓存（maxsize=0 时不写入，查询总是未命中）"""
+    maxsize = RESULT_CACHE.maxsize
+    RESULT_CACHE.maxsize = 0
+    RESULT_CACHE.clear()
+    try:
+        yield
+    finally:
+        RESULT_CACHE.maxsize = maxsize
+
+
+def _times(count: int = 4096) -> Iterator[datetime]:
+    """循环取用的一组分散时刻（约每 37 小时一个），避免只测到同一个农历日"""
+    return cycle([FIXED_TIME + timedelta(hours=37 * i, minutes=i % 60) for i in range(count)])
+
+
+def _converter() -> Callable[[], None]:
+    times = _times()
+
+    def run():
+        converter = LunarDateTimeConverter(next(times))
+        converter.get_basic_info()
+        converter.get_ganzhi_info()
+    return run
+
+
+def _calculate_changes() -> Callable[[], None]:
+    args = cycle([(upper, lower, moving) for upper in range(1, 9) for lower in range(1, 9) for moving in range(1, 7)])
+    return lambda: HexagramCalculator.calculate_changes(*next(args))
+
+
+def _hexagram_details() -> Callable[[], None]:
+    args = cycle([(code, gan) for code in range(64) for gan in constants.TIANGAN])
+    return lambda: get_enhanced_hexagram_details(*next(args))
+
+
+def _parse_yao_details() -> Callable[[], None]:
+    infos = cycle([info for gua in constants.GUA_LIUYAO.values() for info in gua['yao_info']])
+    return lambda: parse_yao_details(next(infos))
+
+
+def _time_divination(vary: bool) -> Callable[[], None]:
+    if not vary:
+        return lambda: perform_time_divination(FIXED_TIME)
+    times = _times()
+    return lambda: perform_time_divination(next(times))
+
+
+def _manual_divination(vary: bool) -> Callable[[], None]:
+    if not vary:
+        return lambda: perform_manual_divination(MANUAL_YAOS, FIXED_TIME)
+    times = _times()
+    return lambda: perform_manual_divination(MANUAL_YAOS, next(times))
+
+
+def _name_divination(vary: bool) -> Callable[[], None]:
+    if not vary:
+        return lambda: perform_name_divination(*NAMES, FIXED_TIME)
+    times = _times()
+    return lambda: perform_name_divination(*NAMES, next(times))
+
+
+# (名称, 构造被测函数, 是否关闭结果缓存)
+ENGINE_BENCHMARKS: List[Tuple[str, Callable[[], Callable[[], None]], bool]] = [
+    ("engine.LunarDateTimeConverter", _converter, False),
+    ("engine.HexagramCalculator.calculate_changes", _calculate_changes, False),
+    ("engine.get_enhanced_hexagram_details", _hexagram_details, False),
+    ("engine.parse_yao_details", _parse_yao_details, False),
+    ("engine.perform_time_divination[cached]", lambda: _time_divination(False), False),
+    ("engine.perform_time_divination[uncached]", lambda: _time_divination(True), True),
+    ("engine.perform_manual_divination[cached]", lambda: _manual_divination(False), False),
+    ("engine.perform_manual_divination[uncached]", lambda: _manual_divination(True), True),
+    ("engine.perform_name_divination[cached]", lambda: _name_divination(False), False),
+    ("engine.perform_name_divination[uncached]", lambda: _name_divination(True), True),
+]
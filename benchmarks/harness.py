@@ -0,0 +1,163 @@
+# benchmarks/harness.py
+"""
+基准测试的计时、结果文件与对比
+
+每个基准先自动确定单轮循环次数（单轮耗时不少于 min_time / repeat），再重复 repeat 轮，
+以各轮吞吐的中位数作为结果。异步基准在同一个事件循环中顺序 await。
+"""
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT_DIR, 'app')
+
+RESULT_FORMAT = 1
+
+# 三种起卦方式的请求体（不含 target_time），供端到端基准与压测共用
+PAYLOADS: Dict[str, Dict[str, Any]] = {
+    "time": {"divination_type": "time"},
+    "manual": {"divination_type": "manual", "manual_yaos": ['阳爻', '阴爻动', '阳爻', '阴爻', '阳爻动', '阴爻']},
+    "name": {"divination_type": "name", "upper_original": "乾", "lower_original": "坤",
+             "upper_changed": "坎", "lower_changed": "离"},
+}
+
+
+class BenchResult(NamedTuple):
+    name: str
+    ops_per_sec: float      # 各轮吞吐的中位数
+    ns_per_op: float        # 对应的单次耗时
+    best_ops_per_sec: float
+    stdev_pct: float        # 各轮吞吐的相对标准差（%）
+    loops: int              # 单轮循环次数
+    repeat: int
+
+
+def ensure_app_path() -> None:
+    """app 内部以 services、schemas 为顶层包导入，需把 app 目录加入 sys.path"""
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+
+
+def _summarize(name: str, loops: int, durations: List[float]) -> BenchResult:
+    rates = [loops / d for d in durations]
+    median = statistics.median(rates)
+    stdev = statistics.stdev(rates) / median * 100 if len(rates) > 1 else 0.0
+    return BenchResult(name, median, 1e9 / median, max(rates), stdev, loops, len(durations))
+
+
+def _calibrate(run_loops: Callable[[int], float], target: float) -> int:
+    loops = 1
+    while True:
+        elapsed = run_loops(loops)
+        if elapsed >= target:
+            return loops
+        # 按已测耗时估算，最多放大 10 倍，避免首轮冷启动误差导致过冲
+        loops = max(loops + 1, min(loops * 10, int(loops * target / max(elapsed, 1e-9) * 1.2)))
+
+
+def bench(name: str, fn: Callable[[], Any], min_time: float = 1.0, repeat: int = 5) -> BenchResult:
+    """同步基准"""
+    def run_loops(loops: int) -> float:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        return time.perf_counter() - start
+
+    loops = _calibrate(run_loops, min_time / repeat)
+    return _summarize(name, loops, [run_loops(loops) for _ in range(repeat)])
+
+
+def bench_async(name: str, fn: Callable[[], Awaitable[Any]], min_time: float = 1.0,
+                repeat: int = 5, loop: Optional[asyncio.AbstractEventLoop] = None) -> BenchResult:
+    """异步基准，fn 每次调用返回一个新的 awaitable"""
+    loop = loop or asyncio.new_event_loop()
+
+    async def timed(loops: int) -> float:
+        start = time.perf_counter()
+        for _ in range(loops):
+            await fn()
+        return time.perf_counter() - start
+
+    def run_loops(loops: int) -> float:
+        return loop.run_until_complete(timed(loops))
+
+    loops = _calibrate(run_loops, min_time / repeat)
+    return _summarize(name, loops, [run_loops(loops) for _ in range(repeat)])
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> Dict[str, Any]:
+    """结果文件中记录的运行环境，对比不同机器或配置的结果时用于排查"""
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'git_commit': _git_commit(),
+        'calendar_backend': os.getenv("LIUYAO_CALENDAR_BACKEND", "lunar_python"),
+        'time_calendar': os.getenv("LIUYAO_TIME_CALENDAR", "default"),
+    }
+
+
+def write_results(path: str, results: List[BenchResult]) -> None:
+    data = {
+        'format': RESULT_FORMAT,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(),
+        'benchmarks': {r.name: r._asdict() for r in results},
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def load_results(path: str) -> Dict[str, Dict[str, Any]]:
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('format') != RESULT_FORMAT:
+        raise ValueError(f"不支持的结果文件格式: {path}")
+    return data['benchmarks']
+
+
+def compare(baseline: Dict[str, Dict[str, Any]], current: Dict[str, Dict[str, Any]],
+            threshold: float) -> List[str]:
+    """
+    逐项对比吞吐并打印
+    :param threshold: 允许的吞吐下降比例，如 0.1 表示下降超过 10% 判为回退
+    :return: 回退的基准名称
+    """
+    regressions = []
+    width = max((len(name) for name in baseline.keys() | current.keys()), default=0)
+    print(f"{'benchmark':<{width}}  {'baseline ops/s':>15}  {'current ops/s':>15}  {'change':>8}")
+    for name in sorted(baseline.keys() | current.keys()):
+        if name not in current or name not in baseline:
+            side = '基线' if name not in baseline else '本次结果'
+            print(f"{name:<{width}}  {'':>15}  {'':>15}  {'':>8}  ({side}中没有该项)")
+            continue
+        old, new = baseline[name]['ops_per_sec'], current[name]['ops_per_sec']
+        change = new / old - 1
+        mark = ''
+        if change < -threshold:
+            regressions.append(name)
+            mark = '  回退'
+        print(f"{name:<{width}}  {old:>15,.1f}  {new:>15,.1f}  {change:>+8.1%}{mark}")
+    return regressions
+
+
+def print_result(result: BenchResult) -> None:
+    print(f"{result.name:<48} {result.ops_per_sec:>14,.1f} ops/s  {result.ns_per_op / 1000:>10.2f} us/op"
+          f"  ±{result.stdev_pct:.1f}%")
@@ -0,0 +1,287 @@
+# benchmarks/loadtest.py
+"""
+本地压测
+
+在本机以 uvicorn 启动服务（N 个 worker），用 asyncio + httpx 按给定比例发送三种起卦请求，
+统计吞吐与延迟分位数。两种施压方式：
+  --concurrency C   闭环：C 个并发客户端，各自收到响应后立即发下一个请求
+  --rps R           开环：按固定速率发请求，延迟从计划发出时刻算起，
+                    服务端变慢时排队时间也计入延迟（避免协调遗漏）
+在仓库根目录运行：
+  python -m benchmarks.loadtest --workers 4 --concurrency 64 --duration 30 --mix time=6,manual=3,name=1
+  API_KEY=<Key> python -m benchmarks.loadtest --url http://127.0.0.1:8000 --rps 500   # 压测已在运行的服务
+自行启动服务时若未设置 API_KEY，生成一个临时 Key 同时交给服务端与压测客户端；
+服务端使用临时目录中的 SQLite 数据库，起卦历史与用量不写入仓库的 liuyao_api.db，压测结束后删除。
+压测客户端本身是单进程，高负载下可能先于服务端饱和，可对照客户端 CPU 占用判断。
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from .harness import APP_DIR, PAYLOADS
+
+# 随机时刻的取值范围（预计算日历覆盖的年份）
+_RANDOM_START = datetime(1900, 1, 1)
+_RANDOM_SPAN_HOURS = 201 * 365 * 24
+
+
+def parse_mix(text: str) -> List[Tuple[str, float]]:
+    """'time=6,manual=3,name=1' -> [('time', 0.6), ('manual', 0.3), ('name', 0.1)]"""
+    weights = []
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in PAYLOADS:
+            raise argparse.ArgumentTypeError(f"未知的起卦类型: {name}")
+        weights.append((name, float(weight or 1)))
+    total = sum(w for _, w in weights)
+    if total <= 0:
+        raise argparse.ArgumentTypeError("比例之和须大于 0")
+    return [(name, w / total) for name, w in weights]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers: int, port: int, api_key: str, database_url: str) -> subprocess.Popen:
+    """在 app 目录下启动 uvicorn，关闭访问日志以免压测被 stdout 拖慢"""
+    env = dict(os.environ, API_KEY=api_key, LIUYAO_DATABASE_URL=database_url)
+    env.setdefault("LIUYAO_LOG_LEVEL", "WARNING")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--no-access-log", "--log-level", "warning"],
+        cwd=APP_DIR, env=env,
+    )
+
+
+async def wait_ready(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url + "/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"服务在 {timeout} 秒内未就绪: {url}")
+
+
+class LoadRecorder:
+    """收集每个请求的延迟与状态"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses = Counter()
+        self.recording = False
+
+    def record(self, divination_type: str, latency: float, status: str) -> None:
+        if not self.recording:
+            return
+        self.statuses[status] += 1
+        self.latencies.setdefault(divination_type, []).append(latency)
+
+
+class RequestFactory:
+    def __init__(self, mix: List[Tuple[str, float]], random_times: bool, seed: int):
+        self.names = [name for name, _ in mix]
+        self.weights = [w for _, w in mix]
+        self.random_times = random_times
+        self.rng = random.Random(seed)
+
+    def next(self) -> Tuple[str, Dict]:
+        divination_type = self.rng.choices(self.names, self.weights)[0]
+        body = dict(PAYLOADS[divination_type])
+        if self.random_times:
+            hours = self.rng.randrange(_RANDOM_SPAN_HOURS)
+            body["target_time"] = (_RANDOM_START + timedelta(hours=hours, minutes=self.rng.randrange(60))).isoformat()
+        return divination_type, body
+
+
+async def _send(client: httpx.AsyncClient, recorder: LoadRecorder, divination_type: str, body: Dict,
+                started: float) -> None:
+    try:
+        response = await client.post("/enhanced-divination", json=body)
+        status = str(response.status_code)
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    recorder.record(divination_type, time.perf_counter() - started, status)
+
+
+async def closed_loop(client, recorder, factory: RequestFactory, concurrency: int, stop_at: float) -> None:
+    async def worker():
+        while time.perf_counter() < stop_at:
+            divination_type, body = factory.next()
+            await _send(client, recorder, divination_type, body, time.perf_counter())
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def open_loop(client, recorder, factory: RequestFactory, rps: float, stop_at: float) -> None:
+    interval = 1 / rps
+    scheduled = time.perf_counter()
+    tasks = set()
+    while scheduled < stop_at:
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        divination_type, body = factory.next()
+        task = asyncio.create_task(_send(client, recorder, divination_type, body, scheduled))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        scheduled += interval
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    values = sorted(values)
+    if not values:
+        return {}
+
+    def at(q: float) -> float:
+        return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+    return {'p50': at(0.50), 'p95': at(0.95), 'p99': at(0.99), 'max': values[-1] * 1000}
+
+
+def summarize(recorder: LoadRecorder, elapsed: float) -> Dict:
+    all_latencies = [v for values in recorder.latencies.values() for v in values]
+    ok = recorder.statuses.get("200", 0)
+    return {
+        'requests': len(all_latencies),
+        'duration_s': elapsed,
+        'throughput_rps': len(all_latencies) / elapsed if elapsed else 0.0,
+        'success_rps': ok / elapsed if elapsed else 0.0,
+        'statuses': dict(recorder.statuses),
+        'latency_ms': _percentiles(all_latencies),
+        'latency_ms_by_type': {name: _percentiles(values) for name, values in recorder.latencies.items()},
+    }
+
+
+def print_summary(summary: Dict, executor_stats: Optional[Dict]) -> None:
+    print(f"请求数 {summary['requests']}，用时 {summary['duration_s']:.1f}s，"
+          f"吞吐 {summary['throughput_rps']:,.1f} req/s（成功 {summary['success_rps']:,.1f} req/s）")
+    print(f"状态: {summary['statuses']}")
+    print(f"{'':<8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  (ms)")
+    rows = [('all', summary['latency_ms'])] + sorted(summary['latency_ms_by_type'].items())
+    for name, p in rows:
+        if p:
+            print(f"{name:<8} {p['p50']:>9.2f} {p['p95']:>9.2f} {p['p99']:>9.2f} {p['max']:>9.2f}")
+    if executor_stats:
+        wait = executor_stats['queue_wait_ms']
+        print(f"服务端排盘线程池（单个 worker）: 拒绝 {executor_stats['rejected']}，"
+              f"排队等待 p50 {wait['p50']:.2f}ms / p99 {wait['p99']:.2f}ms / max {wait['max']:.2f}ms")
+
+
+async def run_load(url: str, api_key: str, args) -> Dict:
+    await wait_ready(url)
+    factory = RequestFactory(args.mix, args.random_times, args.seed)
+    recorder = LoadRecorder()
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=args.timeout,
+                                 headers={"Authorization": f"Bearer {api_key}"}) as client:
+        phases = [(args.warmup, False), (args.duration, True)]
+        elapsed = 0.0
+        for seconds, recording in phases:
+            if seconds <= 0:
+                continue
+            recorder.recording = recording
+            started = time.perf_counter()
+            stop_at = started + seconds
+            if args.rps:
+                await open_loop(client, recorder, factory, args.rps, stop_at)
+            else:
+                await closed_loop(client, recorder, factory, args.concurrency, stop_at)
+            elapsed = time.perf_counter() - started
+
+        executor_stats = None
+        try:
+            response = await client.get("/executor-stats")
+            if response.status_code == 200:
+                executor_stats = response.json()
+        except httpx.HTTPError:
+            pass
+
+    summary = summarize(recorder, elapsed)
+    print_summary(summary, executor_stats)
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest", description="六爻排盘服务本地压测")
+    parser.add_argument("--url", help="压测已在运行的服务，不再自行启动 uvicorn")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker 进程数")
+    parser.add_argument("--port", type=int, help="自行启动时监听的端口（默认随机空闲端口）")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=int, default=32, help="闭环并发数")
+    load.add_argument("--rps", type=float, help="开环目标速率（请求/秒）")
+    parser.add_argument("--duration", type=float, default=10, help="计入统计的压测秒数")
+    parser.add_argument("--warmup", type=float, default=2, help="预热秒数（不计入统计）")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("time=1,manual=1,name=1"),
+                        help="起卦类型比例，如 time=6,manual=3,name=1")
+    parser.add_argument("--random-times", action="store_true",
+                        help="每个请求使用 1900-2100 间的随机时刻（主要测未命中缓存的路径），默认用当前时间")
+    parser.add_argument("--connections", type=int, default=256, help="客户端最大连接数")
+    parser.add_argument("--timeout", type=float, default=30, help="单个请求超时秒数")
+    parser.add_argument("--seed", type=int, default=0, help="请求序列的随机种子")
+    parser.add_argument("--json", help="把统计结果另存为 JSON")
+    args = parser.parse_args(argv)
+
+    api_key = os.getenv("API_KEY")
+    if not api_key:
+        if args.url is not None:
+            parser.error("压测已在运行的服务时须通过环境变量 API_KEY 提供该服务接受的 Key")
+        # 自行启动的服务通过环境变量 API_KEY 接受这个临时 Key
+        api_key = secrets.token_urlsafe(32)
+    server = None
+    data_dir = None
+    url = args.url
+    if url is None:
+        port = args.port or _free_port()
+        data_dir = tempfile.mkdtemp(prefix="liuyao-loadtest-")
+        server = start_server(args.workers, port, api_key, f"sqlite:///{data_dir}/loadtest.db")
+        url = f"http://127.0.0.1:{port}"
+    try:
+        summary = asyncio.run(run_load(url.rstrip("/"), api_key, args))
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                server.wait()
+        if data_dir is not None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    if args.json:
+        summary['config'] = {
+            'url': args.url, 'workers': None if args.url else args.workers,
+            'concurrency': None if args.rps else args.concurrency, 'rps': args.rps,
+            'duration': args.duration, 'mix': dict(args.mix), 'random_times': args.random_times,
+        }
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    return 0 if summary['requests'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,23 +1,70 @@
+import os
+import sys
 import secrets
 import argparse
-from app.database import SessionLocal
-from app.crud import create_api_key
 
-def generate_key(owner: str):
+# app 内部以顶层模块导入（database、models、crud），需把 app 目录加入 sys.path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+from database import SessionLocal, init_db
+from crud import create_api_key, deactivate_api_key, list_api_keys, set_rate_limit
+
+def generate_key(owner: str, rate_limit=None, rate_burst=None):
     """Generates a secure API key and saves it to the database."""
     db = SessionLocal()
     try:
         # 生成一个安全的、URL安全的32字节密钥
         new_key = secrets.token_urlsafe(32)
-        create_api_key(db, key=new_key, owner=owner)
+        create_api_key(db, key=new_key, owner=owner, rate_limit=rate_limit, rate_burst=rate_burst)
         print(f"Successfully created API Key for '{owner}':")
         print(f"Key: {new_key}")
     finally:
         db.close()
 
+def deactivate_key(key_id: int):
+    """Deactivates an API key; running servers drop it from their auth cache within a few seconds."""
+    with SessionLocal() as db:
+        db_key = deactivate_api_key(db, key_id)
+        if db_key is None:
+            print(f"API Key {key_id} not found.")
+            return 1
+        print(f"Deactivated API Key {key_id} ('{db_key.owner}').")
+        return 0
+
+def update_rate_limit(key_id: int, rate_limit, rate_burst):
+    """Sets the per-key rate limit; omitted values fall back to the server defaults."""
+    with SessionLocal() as db:
+        db_key = set_rate_limit(db, key_id, rate_limit, rate_burst)
+        if db_key is None:
+            print(f"API Key {key_id} not found.")
+            return 1
+        print(f"API Key {key_id} ('{db_key.owner}'): rate_limit={rate_limit}, rate_burst={rate_burst}.")
+        return 0
+
+def show_keys():
+    with SessionLocal() as db:
+        for db_key in list_api_keys(db):
+            status = "active" if db_key.is_active else "inactive"
+            limit = "default" if db_key.rate_limit is None else f"{db_key.rate_limit:g}/s burst {db_key.rate_burst or '-'}"
+            print(f"{db_key.id:>5}  {status:<8}  {limit:<20}  {db_key.owner}  {db_key.created_at}")
+
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Create a new API key.")
-    parser.add_argument("--owner", type=str, required=True, help="The owner of the API key (e.g., 'user_A', 'partner_service').")
+    parser = argparse.ArgumentParser(description="Create, list or deactivate API keys.")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--owner", type=str, help="The owner of the API key (e.g., 'user_A', 'partner_service').")
+    action.add_argument("--deactivate", type=int, metavar="ID", help="Deactivate the API key with this id.")
+    action.add_argument("--list", action="store_true", help="List all API keys (without the key text).")
+    action.add_argument("--set-limit", type=int, metavar="ID", help="Set the rate limit of the API key with this id.")
+    parser.add_argument("--rate", type=float, help="Requests per second for --owner / --set-limit (0 = unlimited, omitted = server default).")
+    parser.add_argument("--burst", type=float, help="Burst size for --owner / --set-limit (omitted = max(1, rate)).")
     args = parser.parse_args()
-    
-    generate_key(args.owner)
\ No newline at end of file
+
+    init_db()
+    if args.owner:
+        generate_key(args.owner, args.rate, args.burst)
+    elif args.set_limit is not None:
+        sys.exit(update_rate_limit(args.set_limit, args.rate, args.burst))
+    elif args.deactivate is not None:
+        sys.exit(deactivate_key(args.deactivate))
+    else:
+        show_keys()
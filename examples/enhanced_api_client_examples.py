@@ -8,17 +8,20 @@
 import requests
 import json
 import os
+import sys
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 
 # API配置
 API_BASE_URL = os.getenv("LIUYAO_API_URL", "http://localhost:8001")
-API_KEY = os.getenv("LIUYAO_API_KEY", "your-secret-api-key")
+API_KEY = os.getenv("LIUYAO_API_KEY")  # 服务端不再有默认 Key，可用 python create_api_key.py --owner <名称> 生成
 
 class LiuyaoAPIClient:
     """六爻排盘API客户端"""
     
-    def __init__(self, base_url: str = API_BASE_URL, api_key: str = API_KEY):
+    def __init__(self, base_url: str = API_BASE_URL, api_key: Optional[str] = API_KEY):
+        if not api_key:
+            raise ValueError("未提供 API Key，请设置环境变量 LIUYAO_API_KEY")
         self.base_url = base_url
         self.api_key = api_key
         self.headers = {
@@ -127,6 +130,8 @@ def print_divination_result(result: Dict[str, Any]):
 
 def main():
     """主函数 - 演示三种起卦方式"""
+    if not API_KEY:
+        sys.exit("请先设置环境变量 LIUYAO_API_KEY（可用 python create_api_key.py --owner <名称> 生成）")
     client = LiuyaoAPIClient()
     
     print("六爻排盘API增强版客户端示例")
@@ -0,0 +1,36 @@
+# tests/conftest.py
+"""
+服务以 app 目录为工作目录运行（绝对导入 services、crud 等），测试同样把 app 目录加入 sys.path
+"""
+import os
+import sys
+
+import pytest
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+from services import calendar_backend, time_calendar  # noqa: E402
+from services.result_cache import RESULT_CACHE  # noqa: E402
+
+
+@pytest.fixture
+def use_calendar(monkeypatch):
+    """
+    切换农历后端与预计算时间起卦日历（不读环境变量，也不使用本地生成的日历文件）
+    用法：use_calendar("table", time_calendar=TimeCalendar 或 None)
+    """
+    def select(backend: str, calendar=None):
+        if backend == "table":
+            instance = calendar_backend.TableBackend()
+        else:
+            instance = calendar_backend.LunarPythonBackend()
+        monkeypatch.setattr(calendar_backend, "_backend", instance)
+        monkeypatch.setattr(time_calendar, "_calendar", calendar)
+        monkeypatch.setattr(time_calendar, "_calendar_loaded", True)
+        RESULT_CACHE.clear()
+        return instance
+
+    yield select
+    RESULT_CACHE.clear()
@@ -0,0 +1,97 @@
+# tests/test_calendar.py
+"""
+四柱与农历的快速路径对照 lunar_python：
+  - 日柱、时柱的算术计算（ganzhi.py）
+  - table 后端（calendar_1900_2100.bin）在节交接时刻前后
+  - 预计算时间起卦日历（time_calendar.py）的记录
+完整范围的逐日校验仍用 python -m services.ganzhi / python -m services.calendar_backend verify
+"""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from lunar_python import Lunar, LunarYear, Solar
+
+from services import ganzhi
+from services.calendar_backend import LunarPythonBackend, TableBackend, _solar_to_datetime
+from services.ganzhi import JIAZI
+from services.time_calendar import TimeCalendar, build_calendar, lunar_year_of
+
+JIE_YEARS = (1900, 1950, 2024, 2100)
+
+
+def _sample_times(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    start = datetime(1900, 1, 1)
+    span = int((datetime(2100, 12, 31, 23, 59) - start).total_seconds())
+    times = [start + timedelta(seconds=rng.randrange(span)) for _ in range(count)]
+    # 夜子时按次日日干起时干，单独多取一些 23 点
+    return times + [t.replace(hour=23) for t in times[:count // 4]]
+
+
+def _jie_instants(years):
+    instants = []
+    for year in years:
+        # 偶数下标为节
+        for jd in LunarYear.fromYear(year).getJieQiJulianDays()[::2]:
+            instants.append(_solar_to_datetime(Solar.fromJulianDay(jd)))
+    return instants
+
+
+def test_day_and_hour_pillars_match_lunar_python():
+    for dt in _sample_times(2000):
+        lunar = Lunar.fromDate(dt)
+        assert ganzhi.day_ganzhi(dt) == lunar.getDayInGanZhi(), dt
+        assert ganzhi.hour_ganzhi(dt) == lunar.getTimeInGanZhi(), dt
+
+
+def test_table_backend_matches_lunar_python_around_jie():
+    table, reference = TableBackend(), LunarPythonBackend()
+    for instant in _jie_instants(JIE_YEARS):
+        if not table.start_year <= instant.year <= table.end_year:
+            continue
+        for delta in (-3600, -1, 0, 1, 3599):
+            dt = instant + timedelta(seconds=delta)
+            assert table.lunar_date(dt) == reference.lunar_date(dt), dt
+            assert table.year_month_ganzhi(dt) == reference.year_month_ganzhi(dt), dt
+
+
+@pytest.mark.parametrize("backend", [LunarPythonBackend, TableBackend])
+def test_jie_within_hour_matches_ganzhi_at_hour_ends(backend):
+    backend, reference = backend(), LunarPythonBackend()
+    times = [instant + timedelta(seconds=delta)
+             for instant in _jie_instants(JIE_YEARS) for delta in (-3600, -60, 0, 60, 3600)]
+    unstable = 0
+    for dt in times + _sample_times(200, seed=1):
+        start = dt.replace(minute=0, second=0, microsecond=0)
+        changes = (reference.year_month_ganzhi(start)
+                   != reference.year_month_ganzhi(start + timedelta(minutes=59, seconds=59)))
+        assert backend.jie_within_hour(dt) == changes, dt
+        unstable += changes
+    assert unstable > 0
+
+
+def test_time_calendar_records_match_lunar_python(tmp_path, use_calendar):
+    use_calendar("table")
+    path = str(tmp_path / "time_calendar.bin")
+    build_calendar(path, 2023, 2024, workers=1)
+    calendar = TimeCalendar(path)
+
+    rng = random.Random(2)
+    hours = [datetime(2023, 1, 1) + timedelta(hours=rng.randrange(2 * 365 * 24)) for _ in range(300)]
+    hours += [instant.replace(minute=0, second=0) for instant in _jie_instants((2023, 2024))]
+    skipped = 0
+    for dt in hours:
+        record = calendar.lookup(dt)
+        if record is None:
+            # 只有小时内有节交接时才不保存记录
+            skipped += 1
+            assert LunarPythonBackend().jie_within_hour(dt), dt
+            continue
+        _, _, year_gz, month_gz, day_gz, hour_gz, lunar_month, lunar_day = record
+        lunar = Lunar.fromDate(dt + timedelta(minutes=30))
+        assert (JIAZI[year_gz], JIAZI[month_gz]) == (lunar.getYearInGanZhiExact(), lunar.getMonthInGanZhiExact()), dt
+        assert (JIAZI[day_gz], JIAZI[hour_gz]) == (lunar.getDayInGanZhi(), lunar.getTimeInGanZhi()), dt
+        assert (lunar_year_of(dt, lunar_month), lunar_month, lunar_day) == (
+            lunar.getYear(), lunar.getMonth(), lunar.getDay()), dt
+    assert skipped > 0
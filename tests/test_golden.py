@@ -0,0 +1,64 @@
+# tests/test_golden.py
+"""
+各起卦方式的响应与 golden/divinations.json 逐字段一致
+
+golden 文件由改用算术四柱、农历后端与预计算表之前的实现（逐次调用 lunar_python）生成，
+覆盖普通时刻、夜子时、节交接所在小时的前后、春节、闰月以及 1900/2100 附近的时刻。
+每个用例在三种配置下各算两次（第二次命中结果缓存）：
+lunar_python 后端、table 后端、table 后端 + 预计算时间起卦日历。
+"""
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from services.divination_service import perform_divination
+from services.enhanced_divination_service import (
+    perform_manual_divination, perform_name_divination, perform_time_divination,
+)
+from services.time_calendar import TimeCalendar, build_calendar
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), 'golden', 'divinations.json')
+
+with open(GOLDEN_PATH, encoding='utf-8') as f:
+    CASES = json.load(f)
+
+
+def _perform(case):
+    target_time = datetime.fromisoformat(case["target_time"])
+    if case["type"] == "time":
+        return perform_time_divination(target_time)
+    if case["type"] == "basic":
+        return perform_divination(target_time)
+    if case["type"] == "manual":
+        return perform_manual_divination(case["manual_yaos"], target_time)
+    return perform_name_divination(*case["names"], target_time)
+
+
+@pytest.fixture(scope="module")
+def time_calendar_file(tmp_path_factory):
+    """只覆盖 2023-2024 的时间起卦日历，范围外的用例走实时计算"""
+    from services import calendar_backend
+    saved = calendar_backend._backend
+    calendar_backend._backend = calendar_backend.TableBackend()
+    try:
+        path = str(tmp_path_factory.mktemp("calendar") / "time_calendar.bin")
+        build_calendar(path, 2023, 2024, workers=1)
+    finally:
+        calendar_backend._backend = saved
+    return path
+
+
+@pytest.mark.parametrize("config", ["lunar_python", "table", "table+time_calendar"])
+def test_responses_match_golden(config, use_calendar, time_calendar_file):
+    calendar = TimeCalendar(time_calendar_file) if config == "table+time_calendar" else None
+    use_calendar(config.split("+")[0], calendar)
+    for case in CASES:
+        for _ in range(2):
+            result = json.loads(json.dumps(_perform(case), default=str))
+            assert result == case["expected"], (config, case["type"], case["target_time"])
+
+
+def test_golden_covers_every_divination_type():
+    assert {case["type"] for case in CASES} == {"time", "basic", "manual", "name"}